@@ -0,0 +1,49 @@
+import hashlib
+import json
+from datetime import datetime
+from ..cache import TTLCache
+from .. import metrics
+from ..config import settings
+
+# student_id -> (fingerprint, advice). One entry per student, so a new payment simply
+# replaces the old advice instead of leaving it behind under a stale key.
+_advice = TTLCache(maxsize=settings.ADVICE_CACHE_SIZE, ttl=settings.ADVICE_CACHE_TTL_SECONDS)
+metrics.track_cache("ai_advice", _advice)
+
+
+def fingerprint(student_id: str, breakdown: dict, history: list[dict], totals: dict | None = None) -> str:
+    """Stable hash of everything the advice prompt is built from."""
+    raw = json.dumps({"student": student_id, "breakdown": breakdown, "history": history, "totals": totals}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+async def get(db, student_id: str, key: str) -> str | None:
+    entry = _advice.get(student_id)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+    if not settings.ADVICE_CACHE_PERSIST:
+        return None
+    doc = await db.advice_cache.find_one({"_id": student_id, "fingerprint": key}, {"advice": 1})
+    if doc is None:
+        return None
+    _advice.set(student_id, (key, doc["advice"]))
+    return doc["advice"]
+
+
+async def put(db, student_id: str, key: str, advice: str) -> None:
+    _advice.set(student_id, (key, advice))
+    if settings.ADVICE_CACHE_PERSIST:
+        await db.advice_cache.replace_one(
+            {"_id": student_id},
+            {"fingerprint": key, "advice": advice, "created_at": datetime.utcnow()},
+            upsert=True,
+        )
+
+
+def invalidate(student_id: str) -> None:
+    """Forget a student's advice after a payment.
+
+    Only the in-process entry is dropped, keeping payment commits at two round trips;
+    a persisted entry can no longer match because the history fingerprint has changed.
+    """
+    _advice.pop(student_id)
@@ -0,0 +1,190 @@
+import hashlib
+import io
+import random
+import threading
+import time
+from typing import Any, BinaryIO, Iterator
+from ..config import settings
+
+
+class BackendError(Exception):
+    """A model call failed (raised by the stub when failure injection triggers)."""
+
+
+class LLMBackend:
+    """Blocking model calls used by GeminiService, which runs them on its own thread pool.
+
+    ``contents`` is a prompt string or a list of prompt parts and uploaded-file handles.
+    """
+
+    name = "base"
+
+    def generate(self, contents) -> str:
+        raise NotImplementedError
+
+    def stream(self, contents) -> Iterator[str]:
+        """Yield response text as the model produces it."""
+        raise NotImplementedError
+
+    def upload(self, buffer: BinaryIO, mime_type: str, display_name: str | None) -> Any:
+        """Make a file available to later calls; returns a handle to pass in ``contents``."""
+        raise NotImplementedError
+
+    def delete(self, handle: Any) -> None:
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self):
+        import google.generativeai as genai
+        if not settings.GEMINI_API_KEY:
+            raise RuntimeError("GEMINI_API_KEY not configured")
+        self._genai = genai
+        # Configure the Gemini API
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        # Use gemini-2.5-flash - newer stable model that's confirmed available
+        self.model = genai.GenerativeModel('models/gemini-2.5-flash')
+
+    def generate(self, contents) -> str:
+        return self.model.generate_content(contents).text
+
+    def stream(self, contents) -> Iterator[str]:
+        for chunk in self.model.generate_content(contents, stream=True):
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety metadata only)
+                continue
+            if text:
+                yield text
+
+    def upload(self, buffer: BinaryIO, mime_type: str, display_name: str | None) -> Any:
+        # upload_file only takes io.IOBase instances, and SpooledTemporaryFile is one only
+        # from Python 3.11; hand it the BytesIO or temp file underneath instead
+        if not isinstance(buffer, io.IOBase):
+            buffer = getattr(buffer, "_file", buffer)
+        return self._genai.upload_file(buffer, mime_type=mime_type, display_name=display_name)
+
+    def delete(self, handle: Any) -> None:
+        handle.delete()
+
+
+class StubFile:
+    def __init__(self, digest: str, size: int, mime_type: str):
+        self.digest = digest
+        self.size = size
+        self.mime_type = mime_type
+
+
+class StubBackend(LLMBackend):
+    """Deterministic local model for load tests and offline development.
+
+    Responses depend only on the prompt, so they are stable across runs and cacheable.
+    Latency is drawn from LLM_STUB_LATENCY ("fixed", "uniform", "normal" or "lognormal")
+    and spent sleeping on the calling pool thread, like a blocking SDK call. A seeded
+    RNG drives latency and LLM_STUB_FAILURE_RATE so a run can be replayed exactly.
+    """
+
+    name = "stub"
+
+    def __init__(self):
+        self.distribution = settings.LLM_STUB_LATENCY
+        self.latency_ms = settings.LLM_STUB_LATENCY_MS
+        self.jitter_ms = settings.LLM_STUB_JITTER_MS
+        self.failure_rate = settings.LLM_STUB_FAILURE_RATE
+        self.response_words = settings.LLM_STUB_RESPONSE_WORDS
+        self.chunk_words = max(1, settings.LLM_STUB_CHUNK_WORDS)
+        self._rng = random.Random(settings.LLM_STUB_SEED)
+        # Pool threads share the RNG
+        self._lock = threading.Lock()
+
+    def _latency(self) -> float:
+        """One latency sample in seconds."""
+        mean, jitter = self.latency_ms, self.jitter_ms
+        with self._lock:
+            if self.distribution == "uniform":
+                ms = self._rng.uniform(mean - jitter, mean + jitter)
+            elif self.distribution == "normal":
+                ms = self._rng.gauss(mean, jitter)
+            elif self.distribution == "lognormal":
+                # Long right tail; jitter is the spread around the median
+                sigma = jitter / mean if mean > 0 else 0.0
+                ms = mean * self._rng.lognormvariate(0.0, sigma)
+            else:
+                ms = mean
+        return max(ms, 0.0) / 1000
+
+    def _maybe_fail(self) -> None:
+        if self.failure_rate <= 0:
+            return
+        with self._lock:
+            failed = self._rng.random() < self.failure_rate
+        if failed:
+            raise BackendError("Stub backend injected failure")
+
+    @staticmethod
+    def _digest(contents) -> str:
+        parts = contents if isinstance(contents, list) else [contents]
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(part.digest.encode() if isinstance(part, StubFile) else str(part).encode())
+        return h.hexdigest()
+
+    def _text(self, contents) -> str:
+        digest = self._digest(contents)
+        words = [digest[i * 7 % 58:i * 7 % 58 + 6] for i in range(self.response_words)]
+        return f"Stub response {digest[:12]}: " + " ".join(words)
+
+    def generate(self, contents) -> str:
+        time.sleep(self._latency())
+        self._maybe_fail()
+        return self._text(contents)
+
+    def stream(self, contents) -> Iterator[str]:
+        # Time to first chunk follows the latency distribution; the rest trickle out
+        # over the same total again, spread evenly between chunks
+        time.sleep(self._latency())
+        self._maybe_fail()
+        words = self._text(contents).split(" ")
+        chunks = [" ".join(words[i:i + self.chunk_words]) + " " for i in range(0, len(words), self.chunk_words)]
+        gap = self._latency() / max(len(chunks) - 1, 1)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(gap)
+            yield chunk
+
+    def upload(self, buffer: BinaryIO, mime_type: str, display_name: str | None) -> StubFile:
+        h = hashlib.sha256()
+        size = 0
+        while data := buffer.read(settings.UPLOAD_CHUNK_BYTES):
+            h.update(data)
+            size += len(data)
+        time.sleep(self._latency() / 4)
+        return StubFile(h.hexdigest(), size, mime_type)
+
+    def delete(self, handle: StubFile) -> None:
+        pass
+
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "stub": StubBackend,
+}
+
+
+def create_backend() -> LLMBackend:
+    """Build the backend selected by LLM_BACKEND.
+
+    Raises RuntimeError when it cannot be used (e.g. Gemini without an API key).
+    """
+    try:
+        backend_cls = BACKENDS[settings.LLM_BACKEND]
+    except KeyError:
+        raise RuntimeError(f"Unknown LLM_BACKEND {settings.LLM_BACKEND!r}")
+    return backend_cls()
+
+
+def backend_configured() -> bool:
+    return settings.LLM_BACKEND != "gemini" or bool(settings.GEMINI_API_KEY)
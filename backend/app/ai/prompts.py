@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+from ..config import settings
+
+# Rough chars-per-token ratio for English/numeric text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def compact_json(value) -> str:
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+def _row_line(row: dict, columns: list[str]) -> str:
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerow(["" if row.get(c) is None else row.get(c) for c in columns])
+    return buf.getvalue()
+
+
+class TableBlock:
+    """Records encoded as CSV with the header written once, cut to a token budget.
+
+    Rows are assumed newest first. When they do not all fit, the newest rows are kept
+    and the older ones are replaced by a one-line summary (count, amount total and date
+    range), so the model still knows they exist.
+    """
+
+    def __init__(self, rows: list[dict], columns: list[str], budget: int | None = None, amount_key: str = "amount", date_key: str | None = None):
+        budget = settings.PROMPT_TOKEN_BUDGET if budget is None else budget
+        header = ",".join(columns) + "\n"
+        used = estimate_tokens(header)
+        lines = []
+        for row in rows:
+            line = _row_line(row, columns)
+            cost = estimate_tokens(line)
+            if used + cost > budget:
+                break
+            lines.append(line)
+            used += cost
+        self.included = len(lines)
+        self.omitted = len(rows) - len(lines)
+        text = header + "".join(lines)
+        if self.omitted:
+            older = rows[self.included:]
+            total = sum(float(r.get(amount_key) or 0) for r in older)
+            note = f"... {self.omitted} older records omitted, totalling {total:.2f}"
+            if date_key:
+                dates = [str(r.get(date_key))[:10] for r in older if r.get(date_key)]
+                if dates:
+                    note += f", from {min(dates)} to {max(dates)}"
+            text += note + "\n"
+        self.text = text
+        self.tokens = estimate_tokens(text)
+
+    def __str__(self) -> str:
+        return self.text
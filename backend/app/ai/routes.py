@@ -1,12 +1,53 @@
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Optional
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
 from ..auth.utils import get_current_parent
 from ..db import get_db
-from .services import GeminiService
+from ..config import settings
+from ..payments.summary import PAID_FIELDS
+from ..serialization import dumps
+from .services import get_gemini_service
+from . import advice_cache, summary_cache
+from .uploads import read_upload
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+def _sse(event: str | None, data: dict) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {dumps(data).decode()}\n\n"
+
+async def _once(text: str) -> AsyncIterator[str]:
+    yield text
+
+def sse_response(chunks: AsyncIterator[str], on_complete: Callable[[str], Awaitable[None]] | None = None, **extra) -> StreamingResponse:
+    """Relay text chunks as server-sent events: one `data` event per chunk, then `done`.
+
+    Errors after the stream has started cannot change the status code any more, so they
+    are reported as an `error` event instead.
+    """
+    async def events():
+        parts = []
+        try:
+            async for text in chunks:
+                parts.append(text)
+                yield _sse(None, {"text": text})
+        except HTTPException as e:
+            yield _sse("error", {"detail": e.detail})
+            return
+        except Exception as e:
+            logger.error(f"AI stream failed: {e}", exc_info=True)
+            yield _sse("error", {"detail": "AI generation failed"})
+            return
+        if on_complete is not None:
+            await on_complete("".join(parts))
+        yield _sse("done", extra)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 class DocPayload(BaseModel):
     text: str
 
@@ -14,38 +55,115 @@ class DocPayload(BaseModel):
 async def summarize(
     current = Depends(get_current_parent),
     text: Optional[str] = Form(None),
-    file: Optional[UploadFile] = File(None)
+    file: Optional[UploadFile] = File(None),
+    stream: bool = False,
 ):
     if not text and not file:
         raise HTTPException(status_code=400, detail="Either text or file must be provided")
     
+    # Identical documents are summarized once, whoever uploads them
+    db = get_db()
+    if file:
+        upload = await read_upload(file)
+        key = summary_cache.digest_key("file", upload.digest)
+    else:
+        key = summary_cache.content_key("text", text)
+    cached = await summary_cache.get(db, key)
+    if cached is not None:
+        if stream:
+            return sse_response(_once(cached), cached=True)
+        return {"summary": cached, "cached": True}
+
     try:
-        service = GeminiService()
+        service = get_gemini_service()
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+    if stream:
+        chunks = service.stream_file_summary(upload) if file else service.stream_document_summary(text)
+        return sse_response(chunks, lambda summary: summary_cache.put(db, key, summary), cached=False)
+
     if file:
         # Handle file upload
-        summary = await service.summarize_file(file)
-    else:
-        # Handle text input
-        summary = await service.summarize_document(text)
-    
-    return {"summary": summary}
+        summary = await service.summarize_file(upload)
+        await summary_cache.put(db, key, summary)
+        return {"summary": summary, "cached": False}
+    # Handle text input
+    return await summarize_text(db, text, key)
 
-@router.get("/advice")
-async def advice(current = Depends(get_current_parent)):
-    db = get_db()
-    student = await db.students.find_one({"parent_id": current["_id"]})
+async def summarize_text(db, text: str, key: str | None = None) -> dict:
+    """Summarize a text document through the content-addressed cache.
+
+    Shared by the /summarize route and background jobs.
+    """
+    key = key or summary_cache.content_key("text", text)
+    cached = await summary_cache.get(db, key)
+    if cached is not None:
+        return {"summary": cached, "cached": True}
+    try:
+        service = get_gemini_service()
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    summary = await service.summarize_document(text)
+    await summary_cache.put(db, key, summary)
+    return {"summary": summary, "cached": False}
+
+async def advice_inputs(db, parent_id: str) -> dict:
+    """Load everything the advice prompt is built from, plus its cache fingerprint."""
+    student = await db.students.find_one({"parent_id": parent_id}, {"name": 1, "fee_breakdown": 1, "summary": 1})
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     breakdown = student.get("fee_breakdown", {})
+    # All-time totals come from the account summary, so only recent payments are read
+    summary = student.get("summary")
+    totals = {k: summary.get(k) for k in PAID_FIELDS} if summary else None
     history = []
-    async for p in db.payments.find({"parent_id": current["_id"], "student_id": str(student["_id"]) }).sort("created_at", -1):
+    async for p in db.payments.find(
+        {"parent_id": parent_id, "student_id": str(student["_id"])},
+        {"amount": 1, "category": 1, "status": 1, "created_at": 1},
+    ).sort("created_at", -1).limit(settings.ADVICE_HISTORY_LIMIT):
         history.append({"amount": float(p.get("amount", 0)), "category": p.get("category"), "status": p.get("status"), "created_at": p.get("created_at").isoformat() if hasattr(p.get("created_at"), 'isoformat') else str(p.get("created_at"))})
+    student_id = str(student["_id"])
+    return {
+        "student_id": student_id,
+        "student_name": student.get("name", "Student"),
+        "breakdown": breakdown,
+        "history": history,
+        "totals": totals,
+        "key": advice_cache.fingerprint(student_id, breakdown, history, totals),
+    }
+
+async def generate_advice(db, parent_id: str) -> dict:
+    """Advice for a parent's student, from the cache when inputs are unchanged.
+
+    Shared by the /advice route and background jobs.
+    """
+    inputs = await advice_inputs(db, parent_id)
+    cached = await advice_cache.get(db, inputs["student_id"], inputs["key"])
+    if cached is not None:
+        return {"advice": cached, "cached": True}
+    try:
+        service = get_gemini_service()
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    text = await service.financial_advice(inputs["student_name"], inputs["breakdown"], inputs["history"], inputs["totals"])
+    await advice_cache.put(db, inputs["student_id"], inputs["key"], text)
+    return {"advice": text, "cached": False}
+
+@router.get("/advice")
+async def advice(current = Depends(get_current_parent), stream: bool = False):
+    db = get_db()
+    if not stream:
+        return await generate_advice(db, current["_id"])
+
+    inputs = await advice_inputs(db, current["_id"])
+    student_id, key = inputs["student_id"], inputs["key"]
+    cached = await advice_cache.get(db, student_id, key)
+    if cached is not None:
+        return sse_response(_once(cached), cached=True)
     try:
-        service = GeminiService()
+        service = get_gemini_service()
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
-    text = await service.financial_advice(student.get("name", "Student"), breakdown, history)
-    return {"advice": text}
+    chunks = service.stream_financial_advice(inputs["student_name"], inputs["breakdown"], inputs["history"], inputs["totals"])
+    return sse_response(chunks, lambda text: advice_cache.put(db, student_id, key, text), cached=False)
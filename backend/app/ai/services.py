@@ -1,104 +1,187 @@
-import google.generativeai as genai
 from ..config import settings
+from .. import metrics
 import asyncio
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from functools import partial
-from fastapi import UploadFile
-import tempfile
-import os
+from typing import AsyncIterator
+from fastapi import HTTPException
+from .backends import LLMBackend, backend_configured, create_backend
+from .singleflight import SingleFlight
+from .uploads import BufferedUpload
+from .prompts import TableBlock, compact_json, estimate_tokens
 
-class GeminiService:
-    def __init__(self):
-        if not settings.GEMINI_API_KEY:
-            raise RuntimeError("GEMINI_API_KEY not configured")
-        # Configure the Gemini API
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        # Use gemini-2.5-flash - newer stable model that's confirmed available
-        self.model = genai.GenerativeModel('models/gemini-2.5-flash')
+logger = logging.getLogger(__name__)
 
-    async def summarize_document(self, text: str) -> str:
-        prompt = f"""
-You are a helpful assistant for parents. Summarize the following financial document focusing on:
+FILE_SUMMARY_PROMPT = """
+You are a helpful assistant for parents. Analyze this financial document and provide a clear summary focusing on:
 - Tuition, hostel, transport charges
 - Scholarships or waivers
 - Important due dates and action items
+- Total amounts due
 
-Document:
-{text}
+Please be specific with numbers and dates.
 """
-        # Use sync API with asyncio to avoid v1beta issues
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None, 
-            partial(self.model.generate_content, prompt)
-        )
-        return response.text
-
-    async def summarize_file(self, file: UploadFile) -> str:
-        """Summarize a financial document from an uploaded file (PDF, image, etc.)"""
-        # Read file content
-        content = await file.read()
-        
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp:
-            tmp.write(content)
-            tmp_path = tmp.name
-        
-        try:
-            # Upload file to Gemini
-            loop = asyncio.get_event_loop()
-            uploaded_file = await loop.run_in_executor(
-                None,
-                partial(genai.upload_file, tmp_path, display_name=file.filename)
-            )
-            
-            prompt = """
-You are a helpful assistant for parents. Analyze this financial document and provide a clear summary focusing on:
+
+def document_prompt(text: str) -> str:
+    return f"""
+You are a helpful assistant for parents. Summarize the following financial document focusing on:
 - Tuition, hostel, transport charges
 - Scholarships or waivers
 - Important due dates and action items
-- Total amounts due
 
-Please be specific with numbers and dates.
+Document:
+{text}
 """
-            
-            # Generate content with the uploaded file
-            response = await loop.run_in_executor(
-                None,
-                partial(self.model.generate_content, [prompt, uploaded_file])
-            )
-            
-            # Clean up uploaded file from Gemini
-            await loop.run_in_executor(None, uploaded_file.delete)
-            
-            return response.text
-        finally:
-            # Clean up temporary file
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
 
-    async def financial_advice(self, student_name: str, breakdown: dict, history: list[dict]) -> str:
-        prompt = f"""
+HISTORY_COLUMNS = ["created_at", "category", "amount", "status"]
+
+def advice_prompt(student_name: str, breakdown: dict, history: list[dict], totals: dict | None = None) -> str:
+    table = TableBlock(history, HISTORY_COLUMNS, date_key="created_at")
+    totals_line = f"Totals Paid (all time): {compact_json(totals)}\n" if totals else ""
+    return f"""
 Given a student's fee breakdown and past payment history, provide concise, personalized planning advice for a parent.
 Be practical and mention opportunities to optimize, including the impact of scholarships.
 
 Student: {student_name}
-Fee Breakdown: {breakdown}
-Payment History (latest first): {history}
-"""
-        # Use sync API with asyncio to avoid v1beta issues
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            partial(self.model.generate_content, prompt)
-        )
-        return response.text
+Fee Breakdown (outstanding): {compact_json(breakdown)}
+{totals_line}Payment History (CSV, latest first):
+{table}"""
+
+class GeminiService:
+    """LLM client shared by the whole process (see get_gemini_service).
+
+    Model calls go through the backend selected by LLM_BACKEND (Gemini, or the local
+    stub for load tests). They block, so they run on the service's own thread pool,
+    never the loop's default executor, and an admission semaphore caps how many are
+    in flight at once.
+    """
+
+    def __init__(self, backend: LLMBackend | None = None):
+        self.backend = backend or create_backend()
+        self._executor = ThreadPoolExecutor(max_workers=settings.AI_MAX_CONCURRENCY, thread_name_prefix="gemini")
+        self._slots: asyncio.Semaphore | None = None
+        # Identical prompts in flight at the same time share a single Gemini call
+        self._flights = SingleFlight(self.backend.name)
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Hold one admission slot, failing fast with 503 when too many callers are queued."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY)
+        backend = self.backend.name
+        if self.waiting >= settings.AI_MAX_QUEUE:
+            metrics.AI_REJECTED.inc(backend=backend)
+            raise HTTPException(status_code=503, detail="AI service is busy, please retry shortly", headers={"Retry-After": "2"})
+        self.waiting += 1
+        metrics.AI_QUEUE_DEPTH.inc(backend=backend)
+        queued_at = time.perf_counter()
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+            metrics.AI_QUEUE_DEPTH.dec(backend=backend)
+        started = time.perf_counter()
+        metrics.AI_QUEUE_WAIT.observe(started - queued_at, backend=backend)
+        metrics.AI_IN_FLIGHT.inc(backend=backend)
+        try:
+            yield
+        except Exception:
+            metrics.AI_ERRORS.inc(backend=backend)
+            raise
+        finally:
+            self._slots.release()
+            metrics.AI_IN_FLIGHT.dec(backend=backend)
+            metrics.AI_CALL_LATENCY.observe(time.perf_counter() - started, backend=backend)
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    async def _call(self, fn, *args, **kwargs):
+        """Run a blocking SDK call on the service pool once an admission slot is free."""
+        async with self._slot():
+            return await self._run(fn, *args, **kwargs)
+
+    async def _generate(self, prompt: str) -> str:
+        """Generate text for a prompt, sharing the call with identical concurrent prompts."""
+        async def generate():
+            # Use sync API on the service pool to avoid v1beta issues
+            return await self._call(self.backend.generate, prompt)
+
+        tokens = estimate_tokens(prompt)
+        metrics.AI_PROMPT_TOKENS.inc(tokens, backend=self.backend.name)
+        logger.info(f"{self.backend.name} prompt: ~{tokens} tokens")
+        key = "prompt:" + hashlib.sha256(prompt.encode()).hexdigest()
+        return await self._flights.do(key, generate)
+
+    async def _stream(self, contents) -> AsyncIterator[str]:
+        """Yield response text as the model produces it.
+
+        The admission slot is held for the whole generation, but a pool thread is only
+        busy while waiting for the next chunk.
+        """
+        async with self._slot():
+            chunks = self.backend.stream(contents)
+            while True:
+                text = await self._run(next, chunks, None)
+                if text is None:
+                    break
+                yield text
+
+    @asynccontextmanager
+    async def _uploaded(self, upload: BufferedUpload):
+        """Upload a buffered file to the model for the duration of the block, then delete it there."""
+        upload.buffer.seek(0)
+        uploaded_file = await self._call(self.backend.upload, upload.buffer, upload.mime_type, upload.filename)
+        try:
+            yield uploaded_file
+        finally:
+            # Clean up uploaded file from the backend
+            await self._call(self.backend.delete, uploaded_file)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def summarize_document(self, text: str) -> str:
+        return await self._generate(document_prompt(text))
+
+    def stream_document_summary(self, text: str) -> AsyncIterator[str]:
+        return self._stream(document_prompt(text))
+
+    async def summarize_file(self, upload: BufferedUpload) -> str:
+        """Summarize a financial document from an uploaded file (PDF, image, etc.)"""
+        async def summarize():
+            async with self._uploaded(upload) as uploaded_file:
+                # Generate content with the uploaded file
+                return await self._call(self.backend.generate, [FILE_SUMMARY_PROMPT, uploaded_file])
+
+        # Simultaneous uploads of the same bytes share one upload and generation
+        key = "file:" + upload.digest
+        return await self._flights.do(key, summarize)
+
+    async def stream_file_summary(self, upload: BufferedUpload) -> AsyncIterator[str]:
+        async with self._uploaded(upload) as uploaded_file:
+            async for text in self._stream([FILE_SUMMARY_PROMPT, uploaded_file]):
+                yield text
+
+    async def financial_advice(self, student_name: str, breakdown: dict, history: list[dict], totals: dict | None = None) -> str:
+        return await self._generate(advice_prompt(student_name, breakdown, history, totals))
+
+    def stream_financial_advice(self, student_name: str, breakdown: dict, history: list[dict], totals: dict | None = None) -> AsyncIterator[str]:
+        return self._stream(advice_prompt(student_name, breakdown, history, totals))
 
     async def generate_receipt_summary(self, receipts_data: str, user_prompt: str) -> str:
         """Generate AI-powered summary of receipts based on user prompt"""
         prompt = f"""
 You are a financial assistant AI specialized in analyzing payment receipts and providing insights based on user queries.
 
-You have access to a collection of payment receipts with the following information for each receipt:
+You have access to precomputed aggregates over all of the parent's receipts (totals, per-category,
+per-student and per-month sums) and the most recent receipts as a CSV table with these columns:
 - receipt_id: Unique receipt identifier
 - payment_id: Payment transaction ID
 - student_name: Name of the student
@@ -115,7 +198,7 @@ Always provide:
 3. Organized, easy-to-read formatting
 4. Actionable insights when relevant
 
-If the user asks for specific calculations (totals, averages, trends), perform them accurately.
+If the user asks for specific calculations (totals, averages, trends), base them on the aggregates, which cover every receipt.
 If the user asks for trends or patterns, identify them clearly.
 
 Payment Receipts Data:
@@ -125,10 +208,28 @@ User Query: {user_prompt}
 
 Please analyze the receipts and provide a comprehensive response to the user's query.
 """
-        # Use sync API with asyncio to avoid v1beta issues
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            partial(self.model.generate_content, prompt)
-        )
-        return response.text
+        return await self._generate(prompt)
+
+
+_service: GeminiService | None = None
+
+def get_gemini_service() -> GeminiService:
+    """Return the process-wide GeminiService, creating it on first use.
+
+    Raises RuntimeError when the configured backend is unusable (e.g. no GEMINI_API_KEY).
+    """
+    global _service
+    if _service is None:
+        _service = GeminiService()
+    return _service
+
+def init_gemini_service() -> None:
+    """Build the shared service at startup when its backend is configured."""
+    if backend_configured():
+        get_gemini_service()
+
+def shutdown_gemini_service() -> None:
+    global _service
+    if _service is not None:
+        _service.close()
+        _service = None
@@ -0,0 +1,52 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+from .. import metrics
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller (the leader) starts the work as a task; callers arriving while it
+    runs (followers) await the same task. Everyone gets the same result or exception.
+    A caller that is cancelled only stops waiting; the shared work is cancelled once
+    no caller is waiting for it any more. Leaders and followers are counted in /metrics
+    under ``backend``.
+    """
+
+    def __init__(self, backend: str):
+        self._calls: dict[Hashable, _Call] = {}
+        self.backend = backend
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task, key=key, call=call: self._finish(key, call))
+            metrics.AI_SINGLEFLIGHT_LEADERS.inc(backend=self.backend)
+        else:
+            metrics.AI_SINGLEFLIGHT_FOLLOWERS.inc(backend=self.backend)
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def _finish(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.task.cancelled():
+            # Mark the exception as retrieved even if every waiter already left
+            call.task.exception()
@@ -0,0 +1,45 @@
+import hashlib
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from ..cache import TTLCache
+from .. import metrics
+from ..config import settings
+
+# Bumped whenever the summarize prompts change, so old summaries stop matching
+PROMPT_VERSION = "1"
+
+# Hot documents (e.g. a circular sent to every parent) are served without a Mongo read.
+# The summary_cache collection is capped, which bounds it fleet-wide and evicts oldest first.
+_summaries = TTLCache(maxsize=settings.SUMMARY_CACHE_SIZE, ttl=settings.SUMMARY_CACHE_TTL_SECONDS)
+metrics.track_cache("ai_summaries", _summaries)
+
+
+def digest_key(kind: str, digest: str) -> str:
+    return f"{kind}:{PROMPT_VERSION}:{digest}"
+
+
+def content_key(kind: str, content: bytes | str) -> str:
+    """Address a document by what it contains, not by who uploaded it or its filename."""
+    if isinstance(content, str):
+        content = content.strip().encode()
+    return digest_key(kind, hashlib.sha256(content).hexdigest())
+
+
+async def get(db, key: str) -> str | None:
+    summary = _summaries.get(key)
+    if summary is not None:
+        return summary
+    doc = await db.summary_cache.find_one({"_id": key}, {"summary": 1})
+    if doc is None:
+        return None
+    _summaries.set(key, doc["summary"])
+    return doc["summary"]
+
+
+async def put(db, key: str, summary: str) -> None:
+    _summaries.set(key, summary)
+    try:
+        await db.summary_cache.insert_one({"_id": key, "summary": summary, "created_at": datetime.utcnow()})
+    except DuplicateKeyError:
+        # Another worker summarized the same document concurrently
+        pass
@@ -0,0 +1,79 @@
+import hashlib
+import io
+import mimetypes
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from ..config import settings
+
+# Paths whose request bodies carry document uploads
+UPLOAD_PATHS = ("/ai/summarize",)
+# Allowance for multipart boundaries and the other form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class BufferedUpload:
+    """An uploaded document held in the spooled buffer Starlette parsed it into: in memory
+    when small, on disk past the multipart parser's spool size.
+
+    Buffers are not closed explicitly: a coalesced summary may still be reading the
+    leader's buffer after that request has gone, and the (already unlinked) spool file
+    is released as soon as the last reference drops.
+    """
+
+    def __init__(self, buffer, filename: str, mime_type: str, size: int, digest: str):
+        self.buffer = buffer
+        self.filename = filename
+        self.mime_type = mime_type
+        self.size = size
+        self.digest = digest
+
+
+def _too_large() -> HTTPException:
+    limit_mb = settings.UPLOAD_MAX_BYTES / (1024 * 1024)
+    return HTTPException(status_code=413, detail=f"File too large (limit {limit_mb:.0f} MB)")
+
+
+async def read_upload(file: UploadFile) -> BufferedUpload:
+    """Hash an upload in place, in fixed-size chunks, and take over its buffer.
+
+    Starlette has already spooled the body, so the buffer is kept rather than copied;
+    the UploadFile gets an empty stand-in, since FastAPI closes it when the endpoint
+    returns and a streamed summary reads the buffer after that. Oversized files are
+    rejected from the declared size when known, otherwise from the running total.
+    """
+    if file.size is not None and file.size > settings.UPLOAD_MAX_BYTES:
+        raise _too_large()
+    digest = hashlib.sha256()
+    size = 0
+    await file.seek(0)
+    while chunk := await file.read(settings.UPLOAD_CHUNK_BYTES):
+        size += len(chunk)
+        if size > settings.UPLOAD_MAX_BYTES:
+            raise _too_large()
+        digest.update(chunk)
+    await file.seek(0)
+    buffer, file.file = file.file, io.BytesIO()
+    filename = file.filename or "document"
+    mime_type = file.content_type
+    if not mime_type or mime_type == "application/octet-stream":
+        mime_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return BufferedUpload(buffer, filename, mime_type, size, digest.hexdigest())
+
+
+class UploadSizeLimitMiddleware:
+    """Refuse oversized uploads from Content-Length, before the multipart body is parsed.
+
+    Plain ASGI middleware; requests to other paths pass straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in UPLOAD_PATHS:
+            length = next((v for k, v in scope["headers"] if k == b"content-length"), b"")
+            if length.isdigit() and int(length) > settings.UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD:
+                response = JSONResponse(status_code=413, content={"detail": _too_large().detail})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
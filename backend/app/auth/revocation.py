@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from bson import ObjectId
+from pymongo import ReturnDocument
+from ..config import settings
+from ..db import get_db
+
+logger = logging.getLogger(__name__)
+
+# parent_id -> current token_version, for parents whose tokens were ever revoked.
+# Parents absent from the map are at version 0, so the map stays small.
+_versions: dict[str, int] = {}
+_refresh_task: asyncio.Task | None = None
+
+
+def current_version(parent_id: str) -> int:
+    return _versions.get(parent_id, 0)
+
+
+async def refresh_versions() -> None:
+    db = get_db()
+    versions = {}
+    async for p in db.parents.find({"token_version": {"$gt": 0}}, {"token_version": 1}):
+        versions[str(p["_id"])] = int(p["token_version"])
+    _versions.clear()
+    _versions.update(versions)
+
+
+async def _refresh_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.TOKEN_VERSION_REFRESH_SECONDS)
+        try:
+            await refresh_versions()
+        except Exception as e:
+            logger.warning(f"Token version refresh failed, keeping previous set: {e}")
+
+
+async def start_version_refresh() -> None:
+    """Load the revocation set and keep it fresh in the background."""
+    global _refresh_task
+    await refresh_versions()
+    _refresh_task = asyncio.create_task(_refresh_loop())
+    logger.info(f"Token revocation set loaded ({len(_versions)} entries)")
+
+
+async def stop_version_refresh() -> None:
+    global _refresh_task
+    if _refresh_task:
+        _refresh_task.cancel()
+        _refresh_task = None
+
+
+async def revoke_tokens(parent_id: str) -> int:
+    """Invalidate every token issued to a parent so far; returns the new version.
+
+    Takes effect immediately on this worker and on others at their next refresh.
+    """
+    db = get_db()
+    parent = await db.parents.find_one_and_update(
+        {"_id": ObjectId(parent_id)},
+        {"$inc": {"token_version": 1}},
+        projection={"token_version": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    version = int(parent["token_version"]) if parent else 0
+    _versions[parent_id] = version
+    return version
@@ -1,30 +1,42 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from .schemas import LoginRequest, SignupRequest, Token
-from .utils import hash_password, verify_password, create_access_token, get_current_parent
+from .utils import hash_password_async, verify_password_async, create_access_token, get_current_parent, token_claims, invalidate_parent
+from .revocation import revoke_tokens
 from ..db import get_db
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 router = APIRouter()
 
 @router.post("/signup", response_model=Token)
 async def signup(payload: SignupRequest):
     db = get_db()
-    if await db.parents.find_one({"email": payload.email}):
+    doc = {"email": payload.email, "full_name": payload.full_name, "password_hash": await hash_password_async(payload.password), "role": "parent"}
+    # Uniqueness is enforced by the email_unique index (required at startup, see db.REQUIRED_INDEXES)
+    try:
+        res = await db.parents.insert_one(doc)
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Email already registered")
-    doc = {"email": payload.email, "full_name": payload.full_name, "password_hash": hash_password(payload.password), "role": "parent"}
-    res = await db.parents.insert_one(doc)
-    access = create_access_token({"sub": str(res.inserted_id), "role": "parent"})
+    doc["_id"] = res.inserted_id
+    access = create_access_token(token_claims(doc))
     return {"access_token": access}
 
 @router.post("/login", response_model=Token)
 async def login(payload: LoginRequest):
     db = get_db()
     parent = await db.parents.find_one({"email": payload.email})
-    if not parent or not verify_password(payload.password, parent.get("password_hash", "")):
+    if not parent or not await verify_password_async(payload.password, parent.get("password_hash", "")):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
-    access = create_access_token({"sub": str(parent["_id"]), "role": "parent"})
+    access = create_access_token(token_claims(parent))
     return {"access_token": access}
 
 @router.get("/me")
 async def me(current = Depends(get_current_parent)):
     return current
+
+@router.post("/logout-all")
+async def logout_all(current = Depends(get_current_parent)):
+    """Revoke every token issued to the current parent, including this one."""
+    await revoke_tokens(current["_id"])
+    invalidate_parent(current["_id"])
+    return {"status": "ok"}
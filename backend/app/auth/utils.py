@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from jose import jwt, JWTError
 from passlib.context import CryptContext
@@ -6,11 +8,24 @@ from fastapi.security import OAuth2PasswordBearer
 from typing import Optional
 from ..config import settings
 from ..db import get_db
+from ..cache import TTLCache
+from .. import metrics
+from . import revocation
 from bson import ObjectId
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# Minimal parent dicts keyed by token subject, so most authenticated requests skip Mongo
+_parent_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL_SECONDS)
+metrics.track_cache("auth_parents", _parent_cache)
+
+
+# bcrypt costs 100-300 ms of CPU; it runs here instead of on the event loop.
+# The C extension releases the GIL, so threads give real parallelism.
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_in_flight = 0
+
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -18,12 +33,47 @@ def hash_password(password: str) -> str:
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
+async def _run_hashing(fn, *args):
+    """Run a bcrypt call on the hashing pool, failing fast with 503 when its queue is full."""
+    global _hash_in_flight
+    if _hash_in_flight >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_DEPTH:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in attempts in progress, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    _hash_in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        _hash_in_flight -= 1
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(hash_password, password)
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await _run_hashing(verify_password, plain, hashed)
+
+def shutdown_password_pool() -> None:
+    _hash_executor.shutdown(wait=False, cancel_futures=True)
+
 def create_access_token(data: dict, expires_minutes: int | None = None) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=expires_minutes or settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
 
+def token_claims(parent: dict) -> dict:
+    """Claims for a parent's access token.
+
+    In stateless mode the token also carries everything get_current_parent returns,
+    plus the parent's token version, so authentication needs no database access.
+    """
+    claims = {"sub": str(parent["_id"]), "role": "parent", "ver": int(parent.get("token_version", 0))}
+    if settings.AUTH_STATELESS_TOKENS:
+        claims.update({"email": parent["email"], "full_name": parent.get("full_name", "")})
+    return claims
+
 async def get_current_parent(token: str = Depends(oauth2_scheme)):
     creds_exc = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials", headers={"WWW-Authenticate": "Bearer"})
     try:
@@ -34,9 +84,26 @@ async def get_current_parent(token: str = Depends(oauth2_scheme)):
             raise creds_exc
     except JWTError:
         raise creds_exc
-    db = get_db()
-    parent = await db.parents.find_one({"_id": ObjectId(sub)})
-    if not parent:
+    token_version = int(payload.get("ver", 0))
+    if settings.AUTH_STATELESS_TOKENS and "email" in payload:
+        if token_version < revocation.current_version(sub):
+            raise creds_exc
+        return {"_id": sub, "email": payload["email"], "full_name": payload.get("full_name", ""), "role": "parent"}
+    cached = _parent_cache.get(sub)
+    if cached is None:
+        db = get_db()
+        parent = await db.parents.find_one({"_id": ObjectId(sub)}, {"email": 1, "full_name": 1, "token_version": 1})
+        if not parent:
+            raise creds_exc
+        # Minimal user dict, plus the version needed to reject revoked tokens
+        current = {"_id": str(parent["_id"]), "email": parent["email"], "full_name": parent.get("full_name", ""), "role": "parent"}
+        cached = (current, int(parent.get("token_version", 0)))
+        _parent_cache.set(sub, cached)
+    current, current_version = cached
+    if token_version < current_version:
         raise creds_exc
-    # Return minimal user dict
-    return {"_id": str(parent["_id"]), "email": parent["email"], "full_name": parent.get("full_name", ""), "role": "parent"}
+    return dict(current)
+
+def invalidate_parent(parent_id: str) -> None:
+    """Drop a cached parent; call after changing their profile, password or access."""
+    _parent_cache.pop(parent_id)
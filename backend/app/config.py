@@ -8,7 +8,66 @@ class Settings(BaseSettings):
     JWT_SECRET: str = Field(...)
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    # In-process cache of authenticated parents; 0 TTL effectively disables it
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_SIZE: int = 10_000
+    # Embed email/full_name/token version in access tokens so auth needs no DB read;
+    # forced logouts propagate through a revocation set refreshed every N seconds
+    AUTH_STATELESS_TOKENS: bool = False
+    TOKEN_VERSION_REFRESH_SECONDS: int = 30
+    # Background AI jobs: in-process workers (0 = use `run.py worker` only), retries and leasing
+    JOB_INPROCESS_WORKERS: int = 2
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BASE_SECONDS: int = 5
+    JOB_LEASE_SECONDS: int = 300
+    JOB_POLL_SECONDS: float = 1.0
+    JOB_TTL_SECONDS: int = 7 * 24 * 60 * 60
+    # bcrypt pool: worker threads, plus how many more requests may wait before signup/login return 503
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_DEPTH: int = 64
     GEMINI_API_KEY: str | None = None
+    # Concurrent Gemini calls (and threads in the AI pool), and how many more may queue before 503
+    AI_MAX_CONCURRENCY: int = 8
+    AI_MAX_QUEUE: int = 64
+    # Model behind the AI endpoints: "gemini", or "stub" for deterministic offline responses
+    LLM_BACKEND: str = "gemini"
+    # Stub latency (fixed | uniform | normal | lognormal around LLM_STUB_LATENCY_MS), injected
+    # failure rate, response shape and RNG seed
+    LLM_STUB_LATENCY: str = "lognormal"
+    LLM_STUB_LATENCY_MS: float = 800.0
+    LLM_STUB_JITTER_MS: float = 300.0
+    LLM_STUB_FAILURE_RATE: float = 0.0
+    LLM_STUB_RESPONSE_WORDS: int = 120
+    LLM_STUB_CHUNK_WORDS: int = 8
+    LLM_STUB_SEED: int = 0
+    # Approximate token budget for tabular data (receipts, payment history) in one prompt
+    PROMPT_TOKEN_BUDGET: int = 2_000
+    # /ai/advice cache: in-process LRU, optionally persisted to the advice_cache collection (TTL)
+    ADVICE_CACHE_SIZE: int = 1_000
+    ADVICE_CACHE_TTL_SECONDS: int = 6 * 60 * 60
+    ADVICE_CACHE_PERSIST: bool = True
+    # Most recent payments listed in the advice prompt; older ones are covered by the account summary
+    ADVICE_HISTORY_LIMIT: int = 100
+    # /ai/summarize cache: in-process LRU in front of the capped summary_cache collection
+    SUMMARY_CACHE_SIZE: int = 500
+    SUMMARY_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    SUMMARY_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # /ai/summarize uploads: hard size limit, and the chunk size they are hashed in
+    UPLOAD_MAX_BYTES: int = 20 * 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 256 * 1024
+    # Logging: level, "json" or "text" lines, share of successful requests logged, and the
+    # latency above which a request is always logged
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_SAMPLE_RATE: float = 0.1
+    LOG_SLOW_REQUEST_MS: float = 1_000.0
+    # Wrap multi-document writes in transactions (requires a replica set or Atlas)
+    MONGO_TRANSACTIONS: bool = False
+    # How long Idempotency-Key responses are kept (Mongo TTL index and in-process cache), and
+    # how long a claim may stay pending before a retry can take it over
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 60 * 60
+    IDEMPOTENCY_PENDING_TIMEOUT_SECONDS: int = 60
+    IDEMPOTENCY_CACHE_SIZE: int = 10_000
 
     class Config:
         # Ensure we load backend/.env even when running from project root
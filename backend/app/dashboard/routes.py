@@ -1,51 +1,79 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from bson import ObjectId
 from ..auth.utils import get_current_parent
 from ..db import get_db
+from ..pagination import fetch_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..serialization import BSONJSONResponse
+from ..payments.summary import account_summary
 
 router = APIRouter()
 
 @router.get("/fee-breakdown")
 async def fee_breakdown(current = Depends(get_current_parent)):
     db = get_db()
-    student = await db.students.find_one({"parent_id": current["_id"]})
+    student = await db.students.find_one({"parent_id": current["_id"]}, {"name": 1, "class_id": 1, "fee_breakdown": 1})
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     return {"student_id": str(student["_id"]), "name": student["name"], "class_id": student["class_id"], "fee_breakdown": student.get("fee_breakdown", {})}
 
+# Fields a client may request from /payment-history; parent_id is implied by the token
+PAYMENT_FIELDS = ("student_id", "amount", "category", "status", "created_at", "receipt_id")
+
 @router.get("/payment-history")
-async def payment_history(current = Depends(get_current_parent)):
+async def payment_history(
+    current = Depends(get_current_parent),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    from_date: Optional[datetime] = Query(None, alias="from"),
+    to_date: Optional[datetime] = Query(None, alias="to"),
+    status: Optional[Literal["success", "failed", "pending"]] = None,
+    category: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated subset of payment fields to return"),
+):
     db = get_db()
-    cursor = db.payments.find({"parent_id": current["_id"]}).sort("created_at", -1)
-    items = []
-    async for p in cursor:
-        p["_id"] = str(p["_id"])
-        p["created_at"] = p["created_at"].isoformat()
-        items.append(p)
-    return {"payments": items}
+    query = {"parent_id": current["_id"]}
+    if status:
+        query["status"] = status
+    if category:
+        query["category"] = category
+    if from_date or to_date:
+        query["created_at"] = {}
+        if from_date:
+            query["created_at"]["$gte"] = from_date
+        if to_date:
+            query["created_at"]["$lte"] = to_date
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(PAYMENT_FIELDS)
+    unknown = set(requested) - set(PAYMENT_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    # created_at is always fetched because the page cursor is built from it
+    projection = {f: 1 for f in requested} | {"created_at": 1}
+
+    items, next_cursor = await fetch_page(db.payments, query, limit, after, projection)
+    if "created_at" not in requested:
+        for p in items:
+            del p["created_at"]
+    # Documents go to the encoder as they are; ObjectId and datetime are handled there
+    return BSONJSONResponse({"payments": items, "next_cursor": next_cursor})
 
 @router.get("/upcoming-dues")
 async def upcoming_dues(current = Depends(get_current_parent)):
-    # For demo: dues are now calculated from the current fee_breakdown in student record
-    # (which is already reduced by successful payments)
+    # Dues come from the student's account summary, kept current by every successful
+    # payment; fee_breakdown is only read for students whose summary was never built
     db = get_db()
-    student = await db.students.find_one({"parent_id": current["_id"]})
+    student = await db.students.find_one({"parent_id": current["_id"]}, {"summary": 1, "fee_breakdown": 1})
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    breakdown = student.get("fee_breakdown", {})
-    dues = {}
-
-    for k, v in breakdown.items():
-        if k == "scholarships":
-            continue
-        # Since fee_breakdown already reflects outstanding amounts after successful payments,
-        # we can use it directly as dues
-        due = max(0.0, float(v))
-        dues[k] = due
-
-    # Apply scholarships reduction if present
-    scholarship = float(breakdown.get("scholarships", 0.0) or 0.0)
-    total_due = max(0.0, sum(dues.values()) - scholarship)
-
-    return {"dues_by_category": dues, "scholarships": scholarship, "total_due": total_due}
+    summary = account_summary(student)
+    return BSONJSONResponse({
+        "dues_by_category": summary["outstanding"],
+        "scholarships": summary["scholarships"],
+        "total_due": summary["total_due"],
+        "paid_by_category": summary.get("paid_by_category"),
+        "total_paid": summary.get("total_paid"),
+        "last_payment_at": summary.get("last_payment_at"),
+    })
@@ -1,13 +1,66 @@
 import logging
+from contextlib import asynccontextmanager
 from motor.motor_asyncio import AsyncIOMotorClient
 from .config import settings
-from pymongo.errors import ServerSelectionTimeoutError, ConfigurationError
+from .metrics import mongo_listeners
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import ServerSelectionTimeoutError, ConfigurationError, OperationFailure
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
 client: AsyncIOMotorClient | None = None
 
+# Declarative index registry: collection -> indexes that must exist.
+# Every hot query in the routers should be served by one of these.
+INDEXES: dict[str, list[IndexModel]] = {
+    "parents": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("token_version", ASCENDING)], name="token_version", sparse=True),
+    ],
+    "students": [
+        IndexModel([("parent_id", ASCENDING)], name="parent_id"),
+    ],
+    "payments": [
+        IndexModel([("parent_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="parent_created"),
+        IndexModel([("parent_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="parent_status_created"),
+    ],
+    "reminders": [
+        IndexModel([("parent_id", ASCENDING), ("due_date", ASCENDING)], name="parent_due_date"),
+    ],
+    "advice_cache": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=settings.ADVICE_CACHE_TTL_SECONDS),
+    ],
+    "ai_jobs": [
+        IndexModel([("status", ASCENDING), ("run_after", ASCENDING)], name="status_run_after"),
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)], name="status_lease_until"),
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=settings.JOB_TTL_SECONDS),
+    ],
+    "idempotency_keys": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=settings.IDEMPOTENCY_TTL_SECONDS),
+    ],
+}
+
+# Indexes the code relies on for correctness rather than speed; startup fails without them.
+# Signup has no pre-insert lookup, so email_unique is what keeps emails unique.
+REQUIRED_INDEXES = {"parents": {"email_unique"}}
+
+# Collections that must be capped, with their size limits. Capped collections evict
+# oldest-first, which is what bounds the fleet-wide summary cache.
+CAPPED_COLLECTIONS: dict[str, dict] = {
+    "summary_cache": {"size": settings.SUMMARY_CACHE_MAX_BYTES},
+}
+
+# Representative hot queries, used by `run.py indexes` to show which plan Mongo picks
+_SAMPLE_ID = "000000000000000000000000"
+HOT_QUERIES = [
+    ("parents", {"email": "someone@example.com"}, None),
+    ("students", {"parent_id": _SAMPLE_ID}, None),
+    ("payments", {"parent_id": _SAMPLE_ID}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("payments", {"parent_id": _SAMPLE_ID, "status": "success"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("reminders", {"parent_id": _SAMPLE_ID}, [("due_date", ASCENDING)]),
+]
+
 def get_db():
     if client is None:
         raise RuntimeError("Mongo client not initialized")
@@ -32,12 +85,15 @@ async def connect_to_mongo():
         client = AsyncIOMotorClient(
             settings.MONGODB_URI,
             serverSelectionTimeoutMS=5000,  # 5 second timeout
+            event_listeners=mongo_listeners(),  # command and pool timings for /metrics
         )
 
         # Test the connection
         await client.admin.command('ping')
         logger.info(f"Successfully connected to MongoDB database: {actual_db_name}")
 
+        await ensure_indexes()
+
     except ServerSelectionTimeoutError as e:
         logger.error(f"Failed to connect to MongoDB: {e}")
         raise RuntimeError(f"Cannot connect to MongoDB server at {settings.MONGODB_URI}. Please check your connection string and network access.")
@@ -48,6 +104,84 @@ async def connect_to_mongo():
         logger.error(f"Unexpected error connecting to MongoDB: {e}")
         raise RuntimeError(f"Failed to connect to MongoDB: {e}")
 
+@asynccontextmanager
+async def transaction():
+    """Yield a session with an open transaction, or None when MONGO_TRANSACTIONS is off.
+
+    Operations accept ``session=None``, so callers can pass the yielded value through
+    unconditionally.
+    """
+    if not settings.MONGO_TRANSACTIONS:
+        yield None
+        return
+    if client is None:
+        raise RuntimeError("Mongo client not initialized")
+    async with await client.start_session() as session:
+        async with session.start_transaction():
+            yield session
+
+async def ensure_indexes():
+    """Create capped collections and every index in INDEXES.
+
+    Both steps are no-ops for collections and indexes that already exist. Failing to
+    build an index in REQUIRED_INDEXES raises; any other failure is only logged.
+    """
+    db = get_db()
+    existing = set(await db.list_collection_names())
+    for name, options in CAPPED_COLLECTIONS.items():
+        if name in existing:
+            continue
+        try:
+            await db.create_collection(name, capped=True, **options)
+            logger.info(f"Created capped collection {name} ({options})")
+        except OperationFailure as e:
+            logger.error(f"Failed to create capped collection {name}: {e}")
+    for name, indexes in INDEXES.items():
+        try:
+            created = await db[name].create_indexes(indexes)
+            logger.info(f"Indexes ensured on {name}: {', '.join(created)}")
+        except OperationFailure as e:
+            logger.error(f"Failed to create indexes on {name}: {e}")
+            if name in REQUIRED_INDEXES:
+                # e.g. duplicate emails blocking email_unique; serving would let signup create more
+                raise RuntimeError(f"Required indexes {sorted(REQUIRED_INDEXES[name])} on {name} could not be created: {e}")
+
+def _plan_summary(plan: dict) -> str:
+    """Flatten a winningPlan tree into e.g. 'LIMIT > FETCH > IXSCAN(parent_created)'."""
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage += f"({plan['indexName']})"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " > ".join(stages)
+
+async def index_report() -> dict:
+    """Compare live indexes with the registry and explain each hot query."""
+    db = get_db()
+    report = {"missing": {}, "unused": {}, "unregistered": {}, "plans": []}
+    for name, indexes in INDEXES.items():
+        existing = await db[name].index_information()
+        wanted = {ix.document["name"] for ix in indexes}
+        report["missing"][name] = sorted(wanted - existing.keys())
+        report["unregistered"][name] = sorted(existing.keys() - wanted - {"_id_"})
+        try:
+            stats = await db[name].aggregate([{"$indexStats": {}}]).to_list(length=None)
+            report["unused"][name] = sorted(s["name"] for s in stats if s["accesses"]["ops"] == 0 and s["name"] != "_id_")
+        except OperationFailure as e:
+            logger.warning(f"$indexStats unavailable on {name}: {e}")
+    for name, query, sort in HOT_QUERIES:
+        cursor = db[name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        # Sharded/SBE explains nest the plan one level deeper
+        plan = plan.get("queryPlan", plan)
+        report["plans"].append({"collection": name, "query": query, "sort": sort, "plan": _plan_summary(plan)})
+    return report
+
 async def close_mongo_connection():
     """Close MongoDB connection gracefully."""
     global client
@@ -0,0 +1,100 @@
+import csv
+import io
+from datetime import datetime
+from typing import Literal
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from ..auth.utils import get_current_parent
+from ..db import get_db
+from ..payments.routes import to_receipt, RECEIPT_COLUMNS
+from ..serialization import dumps
+
+router = APIRouter()
+
+# Documents pulled from Mongo per round trip; bounds memory regardless of export size
+EXPORT_BATCH_SIZE = 500
+
+PAYMENT_COLUMNS = ["payment_id", "student_id", "amount", "category", "status", "created_at", "receipt_id"]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def to_payment_row(p: dict) -> dict:
+    return {
+        "payment_id": p["_id"],
+        "student_id": p.get("student_id"),
+        "amount": float(p.get("amount", 0)),
+        "category": p.get("category"),
+        "status": p.get("status"),
+        "created_at": p.get("created_at"),
+        "receipt_id": p.get("receipt_id"),
+    }
+
+
+def _csv_value(value):
+    # Match the NDJSON output: ISO timestamps, ids as plain strings
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def stream_rows(cursor, to_row, columns: list[str], fmt: str):
+    """Encode documents from a Motor cursor one batch at a time as NDJSON or CSV."""
+    if fmt == "ndjson":
+        lines = []
+        async for doc in cursor:
+            lines.append(dumps(to_row(doc)))
+            if len(lines) >= EXPORT_BATCH_SIZE:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+        return
+
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=columns)
+    writer.writeheader()
+    pending = 0
+    async for doc in cursor:
+        writer.writerow({k: _csv_value(v) for k, v in to_row(doc).items()})
+        pending += 1
+        if pending >= EXPORT_BATCH_SIZE:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def export_response(rows, fmt: str, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        rows,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+@router.get("/payments")
+async def export_payments(format: Literal["ndjson", "csv"] = "ndjson", current = Depends(get_current_parent)):
+    """Stream the parent's full payment history, newest first."""
+    db = get_db()
+    cursor = db.payments.find(
+        {"parent_id": current["_id"]},
+        {"parent_id": 0},
+        batch_size=EXPORT_BATCH_SIZE,
+    ).sort([("created_at", -1), ("_id", -1)])
+    return export_response(stream_rows(cursor, to_payment_row, PAYMENT_COLUMNS, format), format, "payments")
+
+
+@router.get("/receipts")
+async def export_receipts(format: Literal["ndjson", "csv"] = "ndjson", current = Depends(get_current_parent)):
+    """Stream every successful payment as a receipt row, newest first."""
+    db = get_db()
+    # A parent has a handful of students, so they are resolved once up front rather than per row
+    students = {str(s["_id"]): s async for s in db.students.find({"parent_id": current["_id"]}, {"name": 1, "class_id": 1})}
+    cursor = db.payments.find(
+        {"parent_id": current["_id"], "status": "success"},
+        {"receipt_id": 1, "student_id": 1, "amount": 1, "category": 1, "created_at": 1},
+        batch_size=EXPORT_BATCH_SIZE,
+    ).sort([("created_at", -1), ("_id", -1)])
+    rows = stream_rows(cursor, lambda p: to_receipt(p, students), RECEIPT_COLUMNS, format)
+    return export_response(rows, format, "receipts")
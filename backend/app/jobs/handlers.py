@@ -0,0 +1,22 @@
+from ..ai.routes import generate_advice, summarize_text
+from ..payments.routes import summarize_receipts_for
+
+
+async def run_summarize(db, job: dict) -> dict:
+    return await summarize_text(db, job["params"]["text"])
+
+
+async def run_advice(db, job: dict) -> dict:
+    return await generate_advice(db, job["parent_id"])
+
+
+async def run_receipt_summary(db, job: dict) -> dict:
+    return await summarize_receipts_for(db, job["parent_id"], job["params"]["prompt"])
+
+
+# Job kind -> coroutine(db, job) returning the JSON result the synchronous endpoint would have
+HANDLERS = {
+    "summarize": run_summarize,
+    "advice": run_advice,
+    "receipt_summary": run_receipt_summary,
+}
@@ -0,0 +1,69 @@
+from datetime import datetime
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
+from ..auth.utils import get_current_parent
+from ..db import get_db
+from .schemas import JobSubmitRequest
+
+router = APIRouter()
+
+
+def _job_view(job: dict) -> dict:
+    view = {
+        "job_id": str(job["_id"]),
+        "kind": job["kind"],
+        "status": job["status"],
+        "attempts": job.get("attempts", 0),
+        "created_at": job["created_at"].isoformat(),
+    }
+    if job.get("finished_at"):
+        view["finished_at"] = job["finished_at"].isoformat()
+    if job.get("error"):
+        view["error"] = job["error"]
+    return view
+
+
+async def _load(job_id: str, parent_id: str, projection: dict | None = None) -> dict:
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    job = await get_db().ai_jobs.find_one({"_id": ObjectId(job_id), "parent_id": parent_id}, projection)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/", status_code=202)
+async def submit_job(payload: JobSubmitRequest, current = Depends(get_current_parent)):
+    """Queue an AI request and return immediately; poll /jobs/{id} for its status."""
+    db = get_db()
+    now = datetime.utcnow()
+    params = {k: v for k, v in {"text": payload.text, "prompt": payload.prompt}.items() if v is not None}
+    res = await db.ai_jobs.insert_one({
+        "parent_id": current["_id"],
+        "kind": payload.kind,
+        "params": params,
+        "status": "queued",
+        "attempts": 0,
+        "run_after": now,
+        "created_at": now,
+        "updated_at": now,
+    })
+    return {"job_id": str(res.inserted_id), "status": "queued"}
+
+
+@router.get("/{job_id}")
+async def job_status(job_id: str, current = Depends(get_current_parent)):
+    job = await _load(job_id, current["_id"], {"result": 0, "params": 0})
+    return _job_view(job)
+
+
+@router.get("/{job_id}/result")
+async def job_result(job_id: str, current = Depends(get_current_parent)):
+    """The job's result once done; 202 with the status while it is still queued or running."""
+    job = await _load(job_id, current["_id"], {"params": 0})
+    if job["status"] == "done":
+        return job["result"]
+    if job["status"] == "failed":
+        raise HTTPException(status_code=502, detail=job.get("error") or "Job failed")
+    return JSONResponse(status_code=202, content=_job_view(job))
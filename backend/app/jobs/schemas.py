@@ -0,0 +1,18 @@
+from pydantic import BaseModel, model_validator
+from typing import Literal, Optional
+
+JobKind = Literal["summarize", "advice", "receipt_summary"]
+
+class JobSubmitRequest(BaseModel):
+    kind: JobKind
+    # summarize: the document text; receipt_summary: the user's question; advice: unused
+    text: Optional[str] = None
+    prompt: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_inputs(self):
+        if self.kind == "summarize" and not self.text:
+            raise ValueError("text is required for summarize jobs")
+        if self.kind == "receipt_summary" and not self.prompt:
+            raise ValueError("prompt is required for receipt_summary jobs")
+        return self
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import socket
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from ..config import settings
+from ..db import get_db
+from .handlers import HANDLERS
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorker:
+    """Pulls AI jobs from the ai_jobs collection and runs them with bounded concurrency.
+
+    Jobs are claimed atomically with find_one_and_update and leased for
+    JOB_LEASE_SECONDS; a job whose worker died is picked up again once its lease
+    expires, unless that was its last attempt, in which case it is marked failed.
+    Failures are retried with exponential backoff up to JOB_MAX_ATTEMPTS, except
+    client errors (4xx), which fail immediately.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.worker_id = f"{socket.gethostname()}:{id(self):x}"
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    async def claim(self, db) -> dict | None:
+        now = datetime.utcnow()
+        job = await db.ai_jobs.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "run_after": {"$lte": now}},
+                {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$lt": settings.JOB_MAX_ATTEMPTS}},
+            ]},
+            {
+                "$set": {"status": "running", "worker": self.worker_id, "lease_until": now + timedelta(seconds=settings.JOB_LEASE_SECONDS), "updated_at": now},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_after", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if job is None:
+            # Nothing to run, so settle jobs whose last attempt died with its worker
+            await self.fail_expired(db, now)
+        return job
+
+    async def fail_expired(self, db, now: datetime) -> None:
+        """Mark jobs whose lease expired on their final attempt as failed."""
+        res = await db.ai_jobs.update_many(
+            {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$gte": settings.JOB_MAX_ATTEMPTS}},
+            {"$set": {"status": "failed", "error": "Worker lease expired on the final attempt", "finished_at": now, "updated_at": now}},
+        )
+        if res.modified_count:
+            logger.error(f"Failed {res.modified_count} job(s) whose lease expired on the final attempt")
+
+    async def run_one(self, db, job: dict) -> None:
+        handler = HANDLERS.get(job["kind"])
+        try:
+            if handler is None:
+                raise HTTPException(status_code=400, detail=f"Unknown job kind {job['kind']}")
+            result = await handler(db, job)
+        except Exception as e:
+            retryable = not (isinstance(e, HTTPException) and e.status_code < 500)
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            now = datetime.utcnow()
+            if retryable and job["attempts"] < settings.JOB_MAX_ATTEMPTS:
+                delay = settings.JOB_RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1)
+                logger.warning(f"Job {job['_id']} attempt {job['attempts']} failed, retrying in {delay}s: {detail}")
+                update = {"status": "queued", "run_after": now + timedelta(seconds=delay), "error": detail, "updated_at": now}
+            else:
+                logger.error(f"Job {job['_id']} failed: {detail}")
+                update = {"status": "failed", "error": detail, "finished_at": now, "updated_at": now}
+            await db.ai_jobs.update_one({"_id": job["_id"], "worker": self.worker_id}, {"$set": update})
+            return
+        now = datetime.utcnow()
+        await db.ai_jobs.update_one(
+            {"_id": job["_id"], "worker": self.worker_id},
+            {"$set": {"status": "done", "result": result, "finished_at": now, "updated_at": now}, "$unset": {"error": ""}},
+        )
+
+    async def _loop(self) -> None:
+        db = get_db()
+        while not self._stopping.is_set():
+            try:
+                job = await self.claim(db)
+            except Exception as e:
+                logger.error(f"Job claim failed: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=settings.JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self.run_one(db, job)
+            except Exception as e:
+                # Usually a failed status write; the job is retried once its lease expires
+                logger.error(f"Job {job['_id']} could not be recorded: {e}")
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._loop()) for _ in range(self.concurrency)]
+        logger.info(f"Job worker {self.worker_id} started with concurrency {self.concurrency}")
+
+    async def stop(self) -> None:
+        """Stop claiming new jobs; running jobs are cancelled and re-run after their lease expires."""
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_forever(self) -> None:
+        self.start()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+_worker: JobWorker | None = None
+
+
+def start_inprocess_worker() -> None:
+    global _worker
+    if settings.JOB_INPROCESS_WORKERS > 0:
+        _worker = JobWorker(settings.JOB_INPROCESS_WORKERS)
+        _worker.start()
+
+
+async def stop_inprocess_worker() -> None:
+    global _worker
+    if _worker is not None:
+        await _worker.stop()
+        _worker = None
@@ -0,0 +1,145 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from .config import settings
+
+logger = logging.getLogger("app.requests")
+
+# Set for the duration of each request, and attached to every record logged meanwhile
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+_listener: QueueListener | None = None
+
+# Attributes every LogRecord has; anything else was passed through ``extra=``
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message and any ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+
+class ContextQueueHandler(QueueHandler):
+    """Hands records to the listener thread, doing only the unavoidable work on the caller.
+
+    The message is rendered here (its arguments may not survive a thread hop) and the
+    request ID is captured while the request's context is still current; formatting
+    and I/O happen on the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if getattr(record, "request_id", None) is None:
+            record.request_id = request_id.get()
+        return record
+
+
+def configure_logging() -> None:
+    """Route all logging through a queue to a background writer. Safe to call twice."""
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(ContextQueueHandler(log_queue))
+    root.setLevel(settings.LOG_LEVEL)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestLogMiddleware:
+    """Log one structured line per request, with a request ID and duration.
+
+    Errors (4xx/5xx, exceptions) and requests slower than LOG_SLOW_REQUEST_MS are always
+    logged; other requests are sampled at LOG_SAMPLE_RATE. Plain ASGI middleware, so it
+    adds no task or stream per request; the duration is measured until the response starts.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rid = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"x-request-id"), None) or uuid.uuid4().hex
+        method, path = scope["method"], scope["path"]
+        token = request_id.set(rid)
+        start = time.perf_counter()
+        status, duration_ms = None, None
+
+        async def send_with_id(message):
+            nonlocal status, duration_ms
+            if message["type"] == "http.response.start":
+                status, duration_ms = message["status"], round((time.perf_counter() - start) * 1000, 2)
+                message["headers"] = [*message.get("headers", ()), (b"x-request-id", rid.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        except Exception:
+            duration_ms = round((time.perf_counter() - start) * 1000, 2)
+            logger.error("%s %s failed after %.1fms", method, path, duration_ms, exc_info=True, extra={
+                "method": method, "path": path, "status": 500, "duration_ms": duration_ms,
+            })
+            raise
+        finally:
+            request_id.reset(token)
+
+        if status is None:
+            return
+        if status >= 500:
+            level = logging.ERROR
+        elif status >= 400 or duration_ms >= settings.LOG_SLOW_REQUEST_MS:
+            level = logging.WARNING
+        elif random.random() < settings.LOG_SAMPLE_RATE:
+            level = logging.INFO
+        else:
+            return
+        if logger.isEnabledFor(level):
+            logger.log(level, "%s %s %s %.1fms", method, path, status, duration_ms, extra={
+                "request_id": rid, "method": method, "path": path, "status": status, "duration_ms": duration_ms,
+            })
@@ -1,20 +1,30 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from .config import settings
+from .serialization import BSONJSONResponse
+from . import metrics
+from .logging_config import configure_logging, RequestLogMiddleware, stop_logging
 from .db import connect_to_mongo, close_mongo_connection, check_mongo_connection
+from .auth.utils import shutdown_password_pool
+from .auth.revocation import start_version_refresh, stop_version_refresh
+from .ai.services import init_gemini_service, shutdown_gemini_service
+from .ai.uploads import UploadSizeLimitMiddleware
 from .auth.routes import router as auth_router
 from .dashboard.routes import router as dashboard_router
 from .payments.routes import router as payments_router
 from .ai.routes import router as ai_router
 from .reminders.routes import router as reminders_router
+from .exports.routes import router as exports_router
+from .jobs.routes import router as jobs_router
+from .jobs.worker import start_inprocess_worker, stop_inprocess_worker
 import logging
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Finance AI Assistant", version="1.0.0")
+app = FastAPI(title="Finance AI Assistant", version="1.0.0", default_response_class=BSONJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,16 +34,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logger.info(f"Request: {request.method} {request.url}")
-    response = await call_next(request)
-    logger.info(f"Response: {response.status_code}")
-    return response
+# Plain ASGI middleware rather than @app.middleware("http"), which costs a task group and
+# a memory stream per request for each layer
+app.add_middleware(UploadSizeLimitMiddleware)
+
+app.add_middleware(RequestLogMiddleware)
+
+# Outermost, so route latencies include every other middleware
+app.add_middleware(metrics.RequestMetricsMiddleware)
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Unhandled error: {exc}", exc_info=True)
+    # Already logged, with its request ID and duration, by RequestLogMiddleware
     return JSONResponse(
         status_code=500,
         content={"detail": "Internal server error"}
@@ -44,22 +56,38 @@ async def startup():
     logger.info("Starting Finance AI Assistant backend...")
     await connect_to_mongo()
     logger.info("Database connected successfully")
+    if settings.AUTH_STATELESS_TOKENS:
+        await start_version_refresh()
+    init_gemini_service()
+    start_inprocess_worker()
 
 @app.on_event("shutdown")
 async def shutdown():
     logger.info("Shutting down Finance AI Assistant backend...")
+    await stop_inprocess_worker()
+    await stop_version_refresh()
     await close_mongo_connection()
+    shutdown_password_pool()
+    shutdown_gemini_service()
+    stop_logging()
 
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(dashboard_router, prefix="/dashboard", tags=["dashboard"])
 app.include_router(payments_router, prefix="/payments", tags=["payments"])
 app.include_router(ai_router, prefix="/ai", tags=["ai"])
 app.include_router(reminders_router, prefix="/reminders", tags=["reminders"])
+app.include_router(exports_router, prefix="/exports", tags=["exports"])
+app.include_router(jobs_router, prefix="/jobs", tags=["jobs"])
 
 @app.get("/")
 async def root():
     return {"status": "ok", "service": app.title, "version": app.version}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus text exposition of route, MongoDB and AI service metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint that verifies database connectivity."""
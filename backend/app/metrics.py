@@ -0,0 +1,280 @@
+import threading
+import time
+from typing import Callable
+from pymongo import monitoring
+from starlette.routing import Match
+
+# Latency buckets in seconds, from a cached point read up to a slow LLM call
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Metric:
+    """A labelled metric in Prometheus' text exposition format.
+
+    Updates may come from pymongo and AI pool threads as well as the event loop, so
+    every metric has its own lock. A metric given ``fn`` (returning {label tuple: value})
+    is read from it at scrape time instead.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), fn: Callable[[], dict] | None = None):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.fn = fn
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _labels(self, key: tuple, extra: str = "") -> str:
+        parts = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def samples(self) -> list[str]:
+        if self.fn is not None:
+            return [f"{self.name}{self._labels(k)} {_number(v)}" for k, v in self.fn().items()]
+        with self._lock:
+            return [f"{self.name}{self._labels(k)} {_number(v)}" for k, v in self._values.items()]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> list[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = self._labels(key, 'le="' + _number(bound) + '"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = self._labels(key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+                lines.append(f"{self.name}_sum{self._labels(key)} {_number(total)}")
+                lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY: list[Metric] = []
+
+
+def render() -> str:
+    return "\n".join(m.render() for m in REGISTRY) + "\n"
+
+
+# ---------- HTTP ----------
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "Time until the response starts, by route template.", ("method", "route", "status"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled, by route template.", ("method", "route"))
+
+
+def route_template(scope: dict) -> str:
+    """The matched route's path template, so /payments/receipt/{payment_id} is one series."""
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """Per-route latency and in-flight requests, as plain ASGI middleware.
+
+    Latency is measured until the response starts; a request stays in flight until
+    its body has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method, route = scope["method"], route_template(scope)
+        HTTP_IN_FLIGHT.inc(method=method, route=route)
+        start = time.perf_counter()
+        status, elapsed = 500, None
+
+        async def timed_send(message):
+            nonlocal status, elapsed
+            if message["type"] == "http.response.start":
+                status, elapsed = message["status"], time.perf_counter() - start
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            HTTP_LATENCY.observe(elapsed if elapsed is not None else time.perf_counter() - start, method=method, route=route, status=status)
+            HTTP_IN_FLIGHT.dec(method=method, route=route)
+
+
+# ---------- MongoDB ----------
+MONGO_COMMAND_LATENCY = Histogram("mongo_command_duration_seconds", "MongoDB command round trips, by collection and command.", ("collection", "command"))
+MONGO_COMMAND_FAILURES = Counter("mongo_command_failures_total", "MongoDB commands that failed, by collection and command.", ("collection", "command"))
+MONGO_CHECKOUT_WAIT = Histogram("mongo_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", ("outcome",))
+MONGO_CONNECTIONS_CHECKED_OUT = Gauge("mongo_pool_connections_checked_out", "Pooled connections currently in use.")
+
+# Commands whose first field is a cursor id rather than a collection name
+_COLLECTION_FIELD = {"getMore": "collection"}
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every command the driver sends, keyed by the collection it targets."""
+
+    def __init__(self):
+        self._pending: dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        field = _COLLECTION_FIELD.get(event.command_name, event.command_name)
+        collection = event.command.get(field)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+
+    def _finish(self, event, failed: bool) -> None:
+        with self._lock:
+            collection = self._pending.pop((event.connection_id, event.request_id), "")
+        MONGO_COMMAND_LATENCY.observe(event.duration_micros / 1_000_000, collection=collection, command=event.command_name)
+        if failed:
+            MONGO_COMMAND_FAILURES.inc(collection=collection, command=event.command_name)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, failed=True)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection checkout waits; a growing wait means maxPoolSize is the bottleneck."""
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        MONGO_CONNECTIONS_CHECKED_OUT.inc()
+        if event.duration is not None:
+            MONGO_CHECKOUT_WAIT.observe(event.duration, outcome="ok")
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        if event.duration is not None:
+            MONGO_CHECKOUT_WAIT.observe(event.duration, outcome=event.reason)
+
+    def connection_checked_in(self, event) -> None:
+        MONGO_CONNECTIONS_CHECKED_OUT.dec()
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        pass
+
+
+def mongo_listeners() -> list:
+    return [CommandMetrics(), PoolMetrics()]
+
+
+# ---------- AI service ----------
+AI_CALL_LATENCY = Histogram("ai_call_duration_seconds", "LLM calls from admission to completion, by backend.", ("backend",))
+AI_QUEUE_WAIT = Histogram("ai_queue_wait_seconds", "Time LLM calls waited for an admission slot, by backend.", ("backend",))
+AI_ERRORS = Counter("ai_call_errors_total", "LLM calls that raised, by backend.", ("backend",))
+AI_QUEUE_DEPTH = Gauge("ai_queue_depth", "LLM calls waiting for an admission slot, by backend.", ("backend",))
+AI_IN_FLIGHT = Gauge("ai_calls_in_flight", "LLM calls holding an admission slot, by backend.", ("backend",))
+AI_REJECTED = Counter("ai_calls_rejected_total", "LLM calls turned away with 503 because the queue was full, by backend.", ("backend",))
+AI_SINGLEFLIGHT_LEADERS = Counter("ai_singleflight_leaders_total", "LLM calls that ran because no identical call was in flight, by backend.", ("backend",))
+AI_SINGLEFLIGHT_FOLLOWERS = Counter("ai_singleflight_followers_total", "LLM calls answered by an identical call already in flight, by backend.", ("backend",))
+AI_PROMPT_TOKENS = Counter("ai_prompt_tokens_estimated_total", "Estimated prompt tokens sent, by backend.", ("backend",))
+
+
+# ---------- In-process caches ----------
+# TTLCaches by name; read at scrape time, on the event loop like every other cache access
+CACHES: dict[str, object] = {}
+
+
+def track_cache(name: str, cache) -> None:
+    CACHES[name] = cache
+
+
+CACHE_ENTRIES = Gauge("cache_entries", "Entries held by each in-process cache.", ("cache",),
+                      fn=lambda: {(name,): len(cache) for name, cache in CACHES.items()})
+CACHE_HITS = Counter("cache_hits_total", "In-process cache lookups that found a live entry.", ("cache",),
+                     fn=lambda: {(name,): cache.hits for name, cache in CACHES.items()})
+CACHE_MISSES = Counter("cache_misses_total", "In-process cache lookups that found nothing or an expired entry.", ("cache",),
+                       fn=lambda: {(name,): cache.misses for name, cache in CACHES.items()})
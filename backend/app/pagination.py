@@ -0,0 +1,52 @@
+import base64
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(doc: dict) -> str:
+    """Build an opaque cursor from the (created_at, _id) sort key of the last item on a page."""
+    raw = f"{doc['created_at'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, oid = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), ObjectId(oid)
+    except (ValueError, InvalidId, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(query: dict, after: str | None) -> dict:
+    """Restrict a query sorted by (created_at desc, _id desc) to items strictly after the cursor."""
+    if not after:
+        return query
+    created_at, oid = decode_cursor(after)
+    return {
+        **query,
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": oid}},
+        ],
+    }
+
+
+KEYSET_SORT = [("created_at", -1), ("_id", -1)]
+
+
+async def fetch_page(collection, query: dict, limit: int, after: str | None = None, projection: dict | None = None):
+    """Fetch one page of documents ordered newest first.
+
+    Reads one extra document to decide whether another page exists, so the cost
+    of a page is independent of how much history sits behind it.
+    """
+    cursor = collection.find(keyset_filter(query, after), projection).sort(KEYSET_SORT).limit(limit + 1)
+    docs = await cursor.to_list(length=limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
@@ -0,0 +1,141 @@
+import re
+from datetime import datetime
+import numpy as np
+
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def _format_amount(value: float) -> str:
+    return f"₹{value:,.2f}"
+
+
+# Only an explicit year, "this year" and "last year" are understood; any other time
+# range or a negation would silently widen the answer, so those prompts go to the LLM
+_NEGATION = re.compile(r"\b(not|except|excluding|exclude|other than|without|besides|apart from)\b|n't\b")
+_SUPPORTED_TIME = re.compile(r"\b(monthly|(per|by|each) month|this year|last year|20\d{2})\b")
+_UNPARSED_TIME = re.compile(
+    r"\b(january|february|march|april|june|july|august|september|october|november|december"
+    r"|jan|feb|mar|apr|jun|jul|aug|sep|sept|oct|nov|dec"
+    r"|months?|weeks?|weekly|days?|daily|years?|yearly|annual|annually|quarters?|semesters?"
+    r"|today|yesterday|recent|recently|ago|since|between|before|after|until"
+    r"|(last|past|previous|next|first) \d+)\b"
+    r"|\b(in|during|since|of|until) may\b|\bmay \d|\d+[/-]\d+"
+)
+
+
+def _mentioned(names: np.ndarray, text: str) -> list[str]:
+    """Distinct names that appear in text as whole words, in sorted order."""
+    return [n for n in sorted(set(names)) if re.search(rf"\b{re.escape(n.lower())}\b", text)]
+
+
+class ReceiptAnalytics:
+    """Vectorized aggregates over a parent's receipts.
+
+    Receipts are loaded once into parallel NumPy arrays so that totals, group
+    sums and monthly trends are computed without Python-level loops.
+    """
+
+    def __init__(self, receipts: list[dict]):
+        self.receipts = receipts
+        self.amounts = np.fromiter((r["amount"] for r in receipts), dtype=np.float64, count=len(receipts))
+        self.categories = np.array([r["category"] for r in receipts], dtype=object)
+        self.students = np.array([r["student_name"] for r in receipts], dtype=object)
+        paid_at = [_as_datetime(r["paid_at"]) for r in receipts]
+        self.years = np.fromiter((d.year for d in paid_at), dtype=np.int32, count=len(paid_at))
+        self.months = np.array([d.strftime("%Y-%m") for d in paid_at], dtype=object)
+
+    def __len__(self) -> int:
+        return len(self.receipts)
+
+    @staticmethod
+    def _group_sum(keys: np.ndarray, values: np.ndarray) -> dict[str, float]:
+        if len(keys) == 0:
+            return {}
+        labels, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=values, minlength=len(labels))
+        return {str(label): round(float(total), 2) for label, total in zip(labels, sums)}
+
+    def _mask(self, category: str | None = None, student: str | None = None, year: int | None = None) -> np.ndarray:
+        mask = np.ones(len(self), dtype=bool)
+        if category:
+            mask &= self.categories == category
+        if student:
+            mask &= self.students == student
+        if year:
+            mask &= self.years == year
+        return mask
+
+    def aggregates(self) -> dict:
+        count = len(self)
+        total = float(self.amounts.sum()) if count else 0.0
+        return {
+            "receipt_count": count,
+            "total_paid": round(total, 2),
+            "average_payment": round(total / count, 2) if count else 0.0,
+            "largest_payment": round(float(self.amounts.max()), 2) if count else 0.0,
+            "by_category": self._group_sum(self.categories, self.amounts),
+            "by_student": self._group_sum(self.students, self.amounts),
+            "by_month": self._group_sum(self.months, self.amounts),
+        }
+
+    def answer(self, prompt: str) -> str | None:
+        """Answer simple numeric questions locally; return None when the LLM is needed."""
+        text = prompt.lower()
+        if _NEGATION.search(text) or _UNPARSED_TIME.search(_SUPPORTED_TIME.sub(" ", text)):
+            return None
+        wants_average = bool(re.search(r"\b(average|avg|mean)\b", text))
+        wants_total = bool(re.search(r"\b(total|sum|how much|spent)\b", text))
+        wants_count = bool(re.search(r"\bhow many\b|\bnumber of\b|\bcount\b", text))
+        wants_monthly = bool(re.search(r"\b(monthly|per month|by month|each month|trend)\b", text))
+        wants_by_category = bool(re.search(r"\b(by|per|each) category\b|\bbreakdown\b", text))
+        wants_by_student = bool(re.search(r"\b(by|per|each) (student|child)\b", text))
+        if not any([wants_average, wants_total, wants_count, wants_monthly, wants_by_category, wants_by_student]):
+            return None
+        # Open-ended questions ("why", "suggest", ...) still go to the LLM
+        if re.search(r"\b(why|should|suggest|advice|recommend|explain|insight)\b", text):
+            return None
+
+        # Several categories, students or years ("tuition and hostel", "last year and
+        # this year") would be narrowed to one of them, so those go to the LLM too
+        categories = _mentioned(self.categories, text)
+        students = _mentioned(self.students, text)
+        now_year = datetime.utcnow().year
+        years = {int(y) for y in re.findall(r"\b(20\d{2})\b", text)}
+        if "this year" in text:
+            years.add(now_year)
+        if "last year" in text:
+            years.add(now_year - 1)
+        if len(categories) > 1 or len(students) > 1 or len(years) > 1:
+            return None
+        category = categories[0] if categories else None
+        student = students[0] if students else None
+        year = years.pop() if years else None
+
+        mask = self._mask(category, student, year)
+        amounts = self.amounts[mask]
+        scope = " ".join(filter(None, [category, "payments", f"for {student}" if student else None, f"in {year}" if year else None]))
+
+        if wants_monthly:
+            by_month = self._group_sum(self.months[mask], amounts)
+            if not by_month:
+                return f"No {scope} found."
+            lines = [f"- {month}: {_format_amount(total)}" for month, total in sorted(by_month.items())]
+            return f"Monthly totals of {scope}:\n" + "\n".join(lines)
+        if wants_by_category or wants_by_student:
+            keys = self.categories if wants_by_category else self.students
+            groups = self._group_sum(keys[mask], amounts)
+            if not groups:
+                return f"No {scope} found."
+            lines = [f"- {key}: {_format_amount(total)}" for key, total in sorted(groups.items(), key=lambda kv: -kv[1])]
+            return f"Breakdown of {scope}:\n" + "\n".join(lines)
+        if len(amounts) == 0:
+            return f"No {scope} found."
+        if wants_average:
+            return f"Average of {len(amounts)} {scope}: {_format_amount(float(amounts.mean()))}"
+        if wants_count and not wants_total:
+            return f"You have {len(amounts)} {scope}."
+        return f"Total of {len(amounts)} {scope}: {_format_amount(float(amounts.sum()))}"
@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from ..cache import TTLCache
+from ..config import settings
+from .. import metrics
+
+# Completed responses, checked before going to Mongo. Entries live no longer than the TTL index.
+_responses = TTLCache(maxsize=settings.IDEMPOTENCY_CACHE_SIZE, ttl=settings.IDEMPOTENCY_TTL_SECONDS)
+metrics.track_cache("idempotency", _responses)
+
+MAX_KEY_LENGTH = 255
+# Writes of the completed response, and the pause before the first retry (doubled after each)
+COMPLETE_ATTEMPTS = 3
+COMPLETE_RETRY_SECONDS = 0.1
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _record_id(parent_id: str, key: str) -> str:
+    # Keys are scoped per parent so one client cannot replay another's response
+    return f"{parent_id}:{key}"
+
+
+def _replay(record: dict, request_fingerprint: str) -> dict:
+    if record["fingerprint"] != request_fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    return record["response"]
+
+
+async def claim(db, parent_id: str, key: str, request_fingerprint: str) -> dict | None:
+    """Claim ``key`` for this request, or return the stored response if it already completed.
+
+    Returns None when the caller now owns the key and must perform the request, then
+    call ``complete`` or ``release``. A claim left pending for longer than
+    IDEMPOTENCY_PENDING_TIMEOUT_SECONDS (its owner died, or could not record the
+    response) is taken over by the next request with the key.
+    """
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+    record_id = _record_id(parent_id, key)
+    cached = _responses.get(record_id)
+    if cached is not None:
+        return _replay(cached, request_fingerprint)
+
+    now = datetime.utcnow()
+    try:
+        await db.idempotency_keys.insert_one({
+            "_id": record_id,
+            "fingerprint": request_fingerprint,
+            "status": "pending",
+            "created_at": now,
+        })
+        return None
+    except DuplicateKeyError:
+        record = await db.idempotency_keys.find_one({"_id": record_id})
+
+    if record and record.get("status") == "pending" and record["created_at"] < now - timedelta(seconds=settings.IDEMPOTENCY_PENDING_TIMEOUT_SECONDS):
+        # Matching on created_at lets exactly one of several concurrent retries take over
+        reclaimed = await db.idempotency_keys.find_one_and_update(
+            {"_id": record_id, "status": "pending", "created_at": record["created_at"]},
+            {"$set": {"fingerprint": request_fingerprint, "created_at": now}},
+        )
+        if reclaimed is not None:
+            logger.warning(f"Idempotency-Key {record_id} was pending since {record['created_at']}; reclaimed")
+            return None
+    if not record or record.get("status") != "complete":
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is already in progress")
+    _responses.set(record_id, record)
+    return _replay(record, request_fingerprint)
+
+
+async def complete(db, parent_id: str, key: str, request_fingerprint: str, response: dict) -> None:
+    """Store the response for replay. Never raises: the request itself has already succeeded.
+
+    The response is cached in-process first, so retries reaching this process replay it
+    even if every write fails; elsewhere the claim stays pending until it times out.
+    """
+    record_id = _record_id(parent_id, key)
+    _responses.set(record_id, {"fingerprint": request_fingerprint, "response": response})
+    delay = COMPLETE_RETRY_SECONDS
+    for attempt in range(1, COMPLETE_ATTEMPTS + 1):
+        try:
+            await db.idempotency_keys.update_one(
+                {"_id": record_id},
+                {"$set": {"status": "complete", "response": response}},
+            )
+            return
+        except PyMongoError as e:
+            if attempt == COMPLETE_ATTEMPTS:
+                logger.error(f"Could not store the response for Idempotency-Key {record_id}: {e}")
+                return
+            await asyncio.sleep(delay)
+            delay *= 2
+
+
+async def release(db, parent_id: str, key: str) -> None:
+    """Drop a claim whose request failed so that a retry can run it again."""
+    await db.idempotency_keys.delete_one({"_id": _record_id(parent_id, key), "status": "pending"})
@@ -1,21 +1,49 @@
 import random
 import uuid
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Header
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from ..auth.utils import get_current_parent
-from ..db import get_db
-from .schemas import PaymentInitRequest
+from ..db import get_db, transaction
+from ..pagination import fetch_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..serialization import BSONJSONResponse
+from ..ai.services import get_gemini_service
+from ..ai import advice_cache
+from ..ai.prompts import TableBlock, compact_json
+from .schemas import PaymentInitRequest, BulkPaymentRequest
+from .analytics import ReceiptAnalytics
+from .summary import payment_totals, summary_stage
+from . import idempotency
 
 router = APIRouter()
 
 @router.post("/initiate")
-async def initiate_payment(payload: PaymentInitRequest, current = Depends(get_current_parent)):
+async def initiate_payment(
+    payload: PaymentInitRequest,
+    current = Depends(get_current_parent),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     db = get_db()
-    student = await db.students.find_one({"_id": ObjectId(payload.student_id), "parent_id": current["_id"]})
-    if not student:
-        raise HTTPException(status_code=404, detail="Student not found or not yours")
-
+    if not idempotency_key:
+        return await commit_payment(db, payload, current)
+
+    # Retries with the same key replay the stored response without touching students/payments
+    request_fingerprint = idempotency.fingerprint(payload.model_dump())
+    replay = await idempotency.claim(db, current["_id"], idempotency_key, request_fingerprint)
+    if replay is not None:
+        return replay
+    try:
+        response = await commit_payment(db, payload, current)
+    except BaseException:
+        await idempotency.release(db, current["_id"], idempotency_key)
+        raise
+    await idempotency.complete(db, current["_id"], idempotency_key, request_fingerprint, response)
+    return response
+
+async def commit_payment(db, payload: PaymentInitRequest, current: dict) -> dict:
     status_choice = payload.simulate or random.choice(["success", "failed"])  # simulate gateway result
 
     doc = {
@@ -27,108 +55,153 @@ async def initiate_payment(payload: PaymentInitRequest, current = Depends(get_cu
         "created_at": datetime.utcnow(),
         "receipt_id": str(uuid.uuid4()) if status_choice == "success" else None,
     }
-    res = await db.payments.insert_one(doc)
-    doc["_id"] = str(res.inserted_id)
-    doc["created_at"] = doc["created_at"].isoformat()
-
-    # If payment is successful, update the student's fee breakdown
-    if status_choice == "success":
-        await update_student_fee_breakdown(db, payload.student_id, payload.category, float(payload.amount))
-
-    return {"payment": doc}
-
-async def update_student_fee_breakdown(db, student_id: str, category: str, payment_amount: float):
-    """Update student's fee breakdown by reducing the outstanding amount for the paid category."""
-    student = await db.students.find_one({"_id": ObjectId(student_id)})
-    if not student or "fee_breakdown" not in student:
-        return
-
-    current_fee_breakdown = student["fee_breakdown"]
-
-    # Check if the category exists in fee breakdown
-    if category not in current_fee_breakdown:
-        return
-
-    # Reduce the outstanding amount for this category
-    current_outstanding = float(current_fee_breakdown[category])
-    new_outstanding = max(0.0, current_outstanding - payment_amount)
 
-    # Update the fee breakdown
-    updated_fee_breakdown = current_fee_breakdown.copy()
-    updated_fee_breakdown[category] = new_outstanding
-
-    # Update the student record
-    await db.students.update_one(
-        {"_id": ObjectId(student_id)},
-        {"$set": {"fee_breakdown": updated_fee_breakdown}}
-    )
-
-import random
-import uuid
-import json
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
-from bson import ObjectId
-from ..auth.utils import get_current_parent
-from ..db import get_db
-from ..ai.services import GeminiService
-from .schemas import PaymentInitRequest
-
-router = APIRouter()
-
-@router.post("/initiate")
-async def initiate_payment(payload: PaymentInitRequest, current = Depends(get_current_parent)):
-    db = get_db()
-    student = await db.students.find_one({"_id": ObjectId(payload.student_id), "parent_id": current["_id"]})
-    if not student:
+    if not ObjectId.is_valid(payload.student_id):
         raise HTTPException(status_code=404, detail="Student not found or not yours")
 
-    status_choice = payload.simulate or random.choice(["success", "failed"])  # simulate gateway result
+    async with transaction() as session:
+        if status_choice != "success":
+            owned = await db.students.count_documents(
+                {"_id": ObjectId(payload.student_id), "parent_id": current["_id"]}, limit=1, session=session
+            )
+            if not owned:
+                raise HTTPException(status_code=404, detail="Student not found or not yours")
+            res = await db.payments.insert_one(doc, session=session)
+        else:
+            # The payment is recorded before fees are reduced, so a failed write never leaves
+            # fees reduced without a payment. The guarded decrement doubles as the ownership
+            # check; when it matches nothing or fails, the payment is removed again (inside
+            # a transaction the abort does that).
+            res = await db.payments.insert_one(doc, session=session)
+            owned = False
+            try:
+                owned = await update_student_fee_breakdown(
+                    db, payload.student_id, payload.category, float(payload.amount),
+                    paid_at=doc["created_at"], parent_id=current["_id"], session=session,
+                )
+            finally:
+                if not owned and session is None:
+                    await db.payments.delete_one({"_id": res.inserted_id})
+            if not owned:
+                raise HTTPException(status_code=404, detail="Student not found or not yours")
 
-    doc = {
-        "parent_id": current["_id"],
-        "student_id": payload.student_id,
-        "amount": float(payload.amount),
-        "category": payload.category,
-        "status": status_choice,
-        "created_at": datetime.utcnow(),
-        "receipt_id": str(uuid.uuid4()) if status_choice == "success" else None,
-    }
-    res = await db.payments.insert_one(doc)
+    if status_choice == "success":
+        advice_cache.invalidate(payload.student_id)
     doc["_id"] = str(res.inserted_id)
     doc["created_at"] = doc["created_at"].isoformat()
-
-    # If payment is successful, update the student's fee breakdown
-    if status_choice == "success":
-        await update_student_fee_breakdown(db, payload.student_id, payload.category, float(payload.amount))
-
     return {"payment": doc}
 
-async def update_student_fee_breakdown(db, student_id: str, category: str, payment_amount: float):
-    """Update student's fee breakdown by reducing the outstanding amount for the paid category."""
-    student = await db.students.find_one({"_id": ObjectId(student_id)})
-    if not student or "fee_breakdown" not in student:
-        return
-
-    current_fee_breakdown = student["fee_breakdown"]
+@router.post("/bulk-initiate")
+async def bulk_initiate_payments(payload: BulkPaymentRequest, current = Depends(get_current_parent)):
+    """Initiate many payments at once (e.g. sponsor disbursements) with a fixed number of round trips.
 
-    # Check if the category exists in fee breakdown
-    if category not in current_fee_breakdown:
-        return
-
-    # Reduce the outstanding amount for this category
-    current_outstanding = float(current_fee_breakdown[category])
-    new_outstanding = max(0.0, current_outstanding - payment_amount)
+    Ownership is checked with one $in query, payments are written with one insert_many
+    and fee breakdowns are updated with one bulk_write. Results are returned per item,
+    in request order. Without a transaction, a payment whose fee update fails is deleted
+    again and reported as an error, as in commit_payment.
+    """
+    db = get_db()
+    items = payload.payments
+    results: list[dict] = [{"index": i} for i in range(len(items))]
+
+    requested = {item.student_id for item in items if ObjectId.is_valid(item.student_id)}
+    owned = set()
+    if requested:
+        async for s in db.students.find(
+            {"_id": {"$in": [ObjectId(sid) for sid in requested]}, "parent_id": current["_id"]}, {"_id": 1}
+        ):
+            owned.add(str(s["_id"]))
+
+    now = datetime.utcnow()
+    docs, doc_indexes, updates, update_docs = [], [], [], []
+    for i, item in enumerate(items):
+        if item.student_id not in owned:
+            results[i].update({"status": "error", "detail": "Student not found or not yours"})
+            continue
+        status_choice = item.simulate or random.choice(["success", "failed"])  # simulate gateway result
+        docs.append({
+            "parent_id": current["_id"],
+            "student_id": item.student_id,
+            "amount": float(item.amount),
+            "category": item.category,
+            "status": status_choice,
+            "created_at": now,
+            "receipt_id": str(uuid.uuid4()) if status_choice == "success" else None,
+        })
+        doc_indexes.append(i)
+        if status_choice == "success":
+            updates.append(UpdateOne({"_id": ObjectId(item.student_id)}, fee_decrement_pipeline(item.category, float(item.amount), now)))
+            update_docs.append(len(docs) - 1)
+
+    unapplied: set[int] = set()  # positions in docs whose fee update failed
+    if docs:
+        async with transaction() as session:
+            await db.payments.insert_many(docs, session=session)
+            if updates:
+                try:
+                    await db.students.bulk_write(updates, ordered=False, session=session)
+                except BulkWriteError as e:
+                    if session is not None:
+                        raise  # the transaction is aborted, so nothing was written
+                    unapplied = {update_docs[err["index"]] for err in e.details.get("writeErrors", [])}
+                except BaseException:
+                    # Outcome unknown (e.g. connection lost): undo the whole batch so a retry is clean
+                    if session is None:
+                        await db.payments.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+                    raise
+            if unapplied:
+                await db.payments.delete_many({"_id": {"$in": [docs[j]["_id"] for j in unapplied]}})
+        # insert_many has set each doc's _id
+        for j, (i, doc) in enumerate(zip(doc_indexes, docs)):
+            if j in unapplied:
+                results[i].update({"status": "error", "detail": "Fee update failed; payment was not recorded"})
+                continue
+            if doc["status"] == "success":
+                advice_cache.invalidate(doc["student_id"])
+            results[i].update({"status": "ok", "payment": doc})
+
+    succeeded = len(docs) - len(unapplied)
+    return BSONJSONResponse({
+        "results": results,
+        "succeeded": succeeded,
+        "failed": len(items) - succeeded,
+    })
+
+def fee_decrement_pipeline(category: str, payment_amount: float, paid_at: datetime) -> list[dict]:
+    """Update pipeline for one successful payment: lower its fee_breakdown category
+    (clamped at zero) and fold it into the student's account summary.
+
+    Runs server-side, so concurrent payments for the same student cannot lose
+    each other's updates. Categories missing from the breakdown are left alone.
+    """
+    field = f"$fee_breakdown.{category}"
+    return [{
+        "$set": {
+            "fee_breakdown": {
+                "$cond": [
+                    {"$eq": [{"$type": field}, "missing"]},
+                    "$fee_breakdown",
+                    {"$setField": {
+                        "field": category,
+                        "input": "$fee_breakdown",
+                        "value": {"$max": [0.0, {"$subtract": [{"$toDouble": field}, payment_amount]}]},
+                    }},
+                ]
+            }
+        }
+    }, summary_stage(category, payment_amount, paid_at)]
 
-    # Update the fee breakdown
-    updated_fee_breakdown = current_fee_breakdown.copy()
-    updated_fee_breakdown[category] = new_outstanding
+async def update_student_fee_breakdown(db, student_id: str, category: str, payment_amount: float, paid_at: datetime, parent_id: str | None = None, session=None) -> bool:
+    """Reduce the outstanding amount for the paid category in a single atomic update.
 
-    # Update the student record
-    await db.students.update_one(
-        {"_id": ObjectId(student_id)},
-        {"$set": {"fee_breakdown": updated_fee_breakdown}}
-    )
+    Returns whether the student matched, so callers can use it as an ownership check
+    when ``parent_id`` is given.
+    """
+    query = {"_id": ObjectId(student_id)}
+    if parent_id is not None:
+        query["parent_id"] = parent_id
+    res = await db.students.update_one(query, fee_decrement_pipeline(category, payment_amount, paid_at), session=session)
+    return res.matched_count > 0
 
 @router.get("/receipt/{payment_id}")
 async def get_receipt(payment_id: str, current = Depends(get_current_parent)):
@@ -139,40 +212,58 @@ async def get_receipt(payment_id: str, current = Depends(get_current_parent)):
     # Dummy receipt content
     receipt = {
         "receipt_id": p.get("receipt_id"),
-        "payment_id": str(p["_id"]),
+        "payment_id": p["_id"],
         "parent_id": p["parent_id"],
         "student_id": p["student_id"],
         "amount": float(p["amount"]),
         "category": p["category"],
-        "paid_at": p["created_at"].isoformat() if hasattr(p["created_at"], 'isoformat') else str(p["created_at"]),
+        "paid_at": p["created_at"],
+    }
+    return BSONJSONResponse({"receipt": receipt})
+
+async def load_students(db, student_ids) -> dict:
+    """Fetch every referenced student in one $in query, keyed by string id."""
+    oids = [ObjectId(sid) for sid in set(student_ids) if ObjectId.is_valid(sid)]
+    if not oids:
+        return {}
+    students = {}
+    async for s in db.students.find({"_id": {"$in": oids}}, {"name": 1, "class_id": 1}):
+        students[str(s["_id"])] = s
+    return students
+
+RECEIPT_COLUMNS = ["receipt_id", "payment_id", "student_name", "student_class", "amount", "category", "paid_at"]
+
+def to_receipt(payment: dict, students: dict) -> dict:
+    student = students.get(payment["student_id"])
+    return {
+        "receipt_id": payment.get("receipt_id"),
+        "payment_id": payment["_id"],
+        "student_name": student["name"] if student else "Unknown Student",
+        "student_class": student["class_id"] if student else "Unknown",
+        "amount": float(payment["amount"]),
+        "category": payment["category"],
+        "paid_at": payment["created_at"],
     }
-    return {"receipt": receipt}
 
 @router.get("/all-receipts")
-async def get_all_receipts(current = Depends(get_current_parent)):
-    """Get all successful payment receipts for the current parent"""
+async def get_all_receipts(
+    current = Depends(get_current_parent),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+):
+    """Get one page of successful payment receipts for the current parent, newest first.
+
+    total_count, total_amount and categories cover all receipts, not just this page.
+    """
     db = get_db()
+    query = {"parent_id": current["_id"], "status": "success"}
 
-    # Get all successful payments for this parent
-    payments = []
-    async for payment in db.payments.find(
-        {"parent_id": current["_id"], "status": "success"}
-    ).sort("created_at", -1):
-        # Get student info for each payment
-        student = await db.students.find_one({"_id": ObjectId(payment["student_id"])})
-
-        receipt = {
-            "receipt_id": payment.get("receipt_id"),
-            "payment_id": str(payment["_id"]),
-            "student_name": student["name"] if student else "Unknown Student",
-            "student_class": student["class_id"] if student else "Unknown",
-            "amount": float(payment["amount"]),
-            "category": payment["category"],
-            "paid_at": payment["created_at"].isoformat() if hasattr(payment["created_at"], 'isoformat') else str(payment["created_at"]),
-        }
-        payments.append(receipt)
+    payments, next_cursor = await fetch_page(db.payments, query, limit, after)
+    students = await load_students(db, [p["student_id"] for p in payments])
+    receipts = [to_receipt(p, students) for p in payments]
+    totals = await payment_totals(db, current["_id"])
 
-    return {"receipts": payments, "total_count": len(payments)}
+    return BSONJSONResponse({"receipts": receipts, **totals, "next_cursor": next_cursor})
 
 @router.post("/summarize-receipts")
 async def summarize_receipts(request: dict, current = Depends(get_current_parent)):
@@ -180,39 +271,36 @@ async def summarize_receipts(request: dict, current = Depends(get_current_parent
     prompt = request.get("prompt", "")
     if not prompt:
         raise HTTPException(status_code=400, detail="Prompt is required")
+    return await summarize_receipts_for(get_db(), current["_id"], prompt)
 
-    db = get_db()
-
+async def summarize_receipts_for(db, parent_id: str, prompt: str) -> dict:
+    """Answer a prompt about a parent's receipts; shared by the route and background jobs."""
     # Get all receipts for this parent
-    receipts_data = []
-    async for payment in db.payments.find(
-        {"parent_id": current["_id"], "status": "success"}
-    ).sort("created_at", -1):
-        # Get student info
-        student = await db.students.find_one({"_id": ObjectId(payment["student_id"])})
-
-        receipt_data = {
-            "receipt_id": payment.get("receipt_id"),
-            "payment_id": str(payment["_id"]),
-            "student_name": student["name"] if student else "Unknown Student",
-            "student_class": student["class_id"] if student else "Unknown",
-            "amount": float(payment["amount"]),
-            "category": payment["category"],
-            "paid_at": payment["created_at"].isoformat() if hasattr(payment["created_at"], 'isoformat') else str(payment["created_at"]),
-        }
-        receipts_data.append(receipt_data)
+    payments = await db.payments.find(
+        {"parent_id": parent_id, "status": "success"},
+        {"receipt_id": 1, "student_id": 1, "amount": 1, "category": 1, "created_at": 1},
+    ).sort("created_at", -1).to_list(length=None)
+    students = await load_students(db, [p["student_id"] for p in payments])
+    receipts_data = [to_receipt(p, students) for p in payments]
 
     if not receipts_data:
         return {"summary": "No payment receipts found to summarize."}
 
-    # Prepare data for AI analysis
-    receipts_text = json.dumps(receipts_data, indent=2, default=str)
+    # Numeric questions (totals, averages, monthly trends) are answered locally
+    analytics = ReceiptAnalytics(receipts_data)
+    local_answer = analytics.answer(prompt)
+    if local_answer is not None:
+        return {"summary": local_answer, "receipts_count": len(receipts_data), "source": "local"}
+
+    # Everything else gets the precomputed aggregates plus the newest receipts that fit the budget
+    recent = TableBlock(receipts_data, RECEIPT_COLUMNS, date_key="paid_at")
+    receipts_text = f"Aggregates: {compact_json(analytics.aggregates())}\nRecent receipts (CSV, newest first):\n{recent}"
 
     # Use AI service to generate summary based on prompt
     try:
-        ai_service = GeminiService()
+        ai_service = get_gemini_service()
         summary = await ai_service.generate_receipt_summary(receipts_text, prompt)
     except RuntimeError:
         summary = "Receipt summarization requires AI service configuration."
 
-    return {"summary": summary, "receipts_count": len(receipts_data)}
+    return {"summary": summary, "receipts_count": len(receipts_data), "source": "ai"}
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, Literal
 
 class PaymentInitRequest(BaseModel):
@@ -6,3 +6,14 @@ class PaymentInitRequest(BaseModel):
     amount: float
     category: str
     simulate: Optional[Literal["success", "failed"]] = None
+
+    @field_validator("category")
+    @classmethod
+    def category_is_plain_key(cls, v: str) -> str:
+        # The category is used as a fee_breakdown field path in Mongo updates
+        if not v or "." in v or v.startswith("$"):
+            raise ValueError("category must be a plain fee category name")
+        return v
+
+class BulkPaymentRequest(BaseModel):
+    payments: list[PaymentInitRequest] = Field(..., min_length=1, max_length=5000)
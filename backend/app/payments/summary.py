@@ -0,0 +1,164 @@
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+
+# Per-student account summary, embedded in the student document as ``summary``:
+#   outstanding       {category: amount still due}, from fee_breakdown, clamped at zero
+#   scholarships      scholarship amount credited against the total
+#   total_due         sum(outstanding) - scholarships, clamped at zero
+#   paid_by_category  {category: total of successful payments}
+#   total_paid, payment_count, last_payment_at, updated_at
+# Embedding it lets a payment update fee_breakdown and the summary in one atomic
+# write; students without one (created before this existed) need `run.py summaries`.
+
+PAID_FIELDS = ("paid_by_category", "total_paid", "payment_count", "last_payment_at")
+
+# Students written per bulk_write during a rebuild
+REBUILD_BATCH_SIZE = 1_000
+
+_OUTSTANDING_PAIRS = {
+    "$filter": {
+        "input": {"$objectToArray": {"$ifNull": ["$fee_breakdown", {}]}},
+        "cond": {"$ne": ["$$this.k", "scholarships"]},
+    }
+}
+_CLAMPED = {"$max": [0.0, {"$toDouble": "$$this.v"}]}
+_SCHOLARSHIPS = {"$toDouble": {"$ifNull": ["$fee_breakdown.scholarships", 0.0]}}
+
+
+def _no_payments() -> dict:
+    return {"paid_by_category": {}, "total_paid": 0.0, "payment_count": 0, "last_payment_at": None}
+
+
+def dues(breakdown: dict) -> dict:
+    """Outstanding amounts, scholarship and total due for a fee_breakdown."""
+    outstanding = {k: max(0.0, float(v)) for k, v in breakdown.items() if k != "scholarships"}
+    scholarships = float(breakdown.get("scholarships", 0.0) or 0.0)
+    return {
+        "outstanding": outstanding,
+        "scholarships": scholarships,
+        "total_due": max(0.0, sum(outstanding.values()) - scholarships),
+    }
+
+
+def summary_stage(category: str, amount: float, paid_at: datetime) -> dict:
+    """Pipeline stage that folds one successful payment into the student's summary.
+
+    Runs after the fee_breakdown decrement in the same update, so the outstanding
+    part is recomputed from the new breakdown. Students without a summary are left
+    without one; a partial paid total would be worse than none.
+    """
+    paid = {"$ifNull": ["$summary.paid_by_category", {}]}
+    return {
+        "$set": {
+            "summary": {
+                "$cond": [
+                    {"$eq": [{"$type": "$summary"}, "missing"]},
+                    "$$REMOVE",
+                    {"$mergeObjects": ["$summary", {
+                        "outstanding": {"$arrayToObject": {"$map": {
+                            "input": _OUTSTANDING_PAIRS,
+                            "in": {"k": "$$this.k", "v": _CLAMPED},
+                        }}},
+                        "scholarships": _SCHOLARSHIPS,
+                        "total_due": {"$max": [0.0, {"$subtract": [
+                            {"$sum": {"$map": {"input": _OUTSTANDING_PAIRS, "in": _CLAMPED}}},
+                            _SCHOLARSHIPS,
+                        ]}]},
+                        "paid_by_category": {"$setField": {
+                            "field": category,
+                            "input": paid,
+                            "value": {"$add": [{"$ifNull": [{"$getField": {"field": category, "input": paid}}, 0.0]}, amount]},
+                        }},
+                        "total_paid": {"$add": [{"$ifNull": ["$summary.total_paid", 0.0]}, amount]},
+                        "payment_count": {"$add": [{"$ifNull": ["$summary.payment_count", 0]}, 1]},
+                        "last_payment_at": {"$max": ["$summary.last_payment_at", paid_at]},
+                        "updated_at": "$$NOW",
+                    }]},
+                ]
+            }
+        }
+    }
+
+
+def account_summary(student: dict) -> dict:
+    """The student's summary, or the part derivable from fee_breakdown when it has none."""
+    summary = student.get("summary")
+    if summary is not None:
+        return summary
+    return dues(student.get("fee_breakdown", {}))
+
+
+async def payment_totals(db, parent_id: str) -> dict:
+    """Count, amount and categories of a parent's successful payments, from the summaries.
+
+    One indexed read of the parent's students, however long their history. Students
+    without a summary yet are totalled from their payments instead.
+    """
+    count, amount, categories, missing = 0, 0.0, set(), []
+    projection = {"summary.payment_count": 1, "summary.total_paid": 1, "summary.paid_by_category": 1}
+    async for student in db.students.find({"parent_id": parent_id}, projection):
+        summary = student.get("summary")
+        if summary is None:
+            missing.append(str(student["_id"]))
+            continue
+        count += summary.get("payment_count", 0)
+        amount += float(summary.get("total_paid", 0.0))
+        categories.update(summary.get("paid_by_category", {}))
+    if missing:
+        pipeline = [
+            {"$match": {"parent_id": parent_id, "status": "success", "student_id": {"$in": missing}}},
+            {"$group": {"_id": "$category", "count": {"$sum": 1}, "total": {"$sum": "$amount"}}},
+        ]
+        async for row in db.payments.aggregate(pipeline):
+            count += row["count"]
+            amount += float(row["total"])
+            categories.add(row["_id"])
+    return {"total_count": count, "total_amount": round(amount, 2), "categories": sorted(categories)}
+
+
+async def rebuild_summaries(db, student_ids: list[str] | None = None) -> int:
+    """Recompute summaries from fee_breakdown and the payments collection.
+
+    One aggregation over successful payments, then batched bulk writes. Payments committed
+    while it runs may be missed, so run it when payments are quiet (or run it twice).
+    Returns the number of students updated.
+    """
+    match = {"status": "success"}
+    student_query = {}
+    if student_ids is not None:
+        match["student_id"] = {"$in": student_ids}
+        student_query["_id"] = {"$in": [ObjectId(sid) for sid in student_ids if ObjectId.is_valid(sid)]}
+
+    paid: dict[str, dict] = {}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"student_id": "$student_id", "category": "$category"},
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+            "last": {"$max": "$created_at"},
+        }},
+    ]
+    async for row in db.payments.aggregate(pipeline):
+        entry = paid.setdefault(row["_id"]["student_id"], _no_payments())
+        entry["paid_by_category"][row["_id"]["category"]] = float(row["total"])
+        entry["total_paid"] += float(row["total"])
+        entry["payment_count"] += row["count"]
+        if entry["last_payment_at"] is None or row["last"] > entry["last_payment_at"]:
+            entry["last_payment_at"] = row["last"]
+
+    now = datetime.utcnow()
+    updates, rebuilt = [], 0
+    async for student in db.students.find(student_query, {"fee_breakdown": 1}):
+        totals = paid.get(str(student["_id"]), _no_payments())
+        summary = {**dues(student.get("fee_breakdown", {})), **totals, "updated_at": now}
+        updates.append(UpdateOne({"_id": student["_id"]}, {"$set": {"summary": summary}}))
+        if len(updates) >= REBUILD_BATCH_SIZE:
+            await db.students.bulk_write(updates, ordered=False)
+            rebuilt += len(updates)
+            updates = []
+    if updates:
+        await db.students.bulk_write(updates, ordered=False)
+        rebuilt += len(updates)
+    return rebuilt
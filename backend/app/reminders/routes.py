@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from bson import ObjectId
 from ..auth.utils import get_current_parent
 from ..db import get_db
+from ..serialization import BSONJSONResponse
 from .schemas import ReminderCreate
 
 router = APIRouter()
@@ -25,8 +26,5 @@ async def create_reminder(payload: ReminderCreate, current = Depends(get_current
 @router.get("/")
 async def list_reminders(current = Depends(get_current_parent)):
     db = get_db()
-    items = []
-    async for r in db.reminders.find({"parent_id": current["_id"]}).sort("due_date", 1):
-        r["_id"] = str(r["_id"])
-        items.append(r)
-    return {"reminders": items}
+    items = await db.reminders.find({"parent_id": current["_id"]}).sort("due_date", 1).to_list(length=None)
+    return BSONJSONResponse({"reminders": items})
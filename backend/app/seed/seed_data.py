@@ -1,5 +1,6 @@
 from ..db import get_db, connect_to_mongo, close_mongo_connection
 from ..auth.utils import hash_password
+from ..payments.summary import rebuild_summaries
 from datetime import datetime, timedelta
 
 async def reset_and_update_fee_breakdowns():
@@ -113,5 +114,8 @@ async def run_seed():
         if not dup:
             await db.reminders.insert_one(r)
 
+    # Payments above bypass the payment routes, so build account summaries from scratch
+    await rebuild_summaries(db)
+
     print("Seeded parents, students, payments, reminders.")
     await close_mongo_connection()
@@ -0,0 +1,33 @@
+import orjson
+from bson import Decimal128, ObjectId
+from fastapi.responses import JSONResponse
+
+# numpy scalars come out of the receipt analytics; non-str keys out of group-bys
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def bson_default(obj):
+    """Encode the BSON types orjson does not know; datetimes it handles natively."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return str(obj.to_decimal())
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    return orjson.dumps(obj, default=bson_default, option=_OPTIONS)
+
+
+class BSONJSONResponse(JSONResponse):
+    """JSON response rendered by orjson, accepting Mongo documents as they come back.
+
+    Used as the app's default response class. Routes that return raw documents
+    (ObjectId, datetime) should return an instance directly: FastAPI only skips its
+    own recursive jsonable_encoder pass for Response objects.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,98 @@
+"""Dashboard latency while logins run concurrently.
+
+Drives /dashboard/fee-breakdown in-process (httpx + ASGI transport, same event loop as
+the app) with and without a background stream of /auth/login calls, and prints
+p50/p95/p99 for each phase. With bcrypt on the event loop the p99 under login load
+jumps by hundreds of milliseconds; with the hashing pool it should stay flat.
+
+Uses the MongoDB at MONGODB_URI and creates a throwaway parent + student.
+
+    cd backend
+    python -m benchmarks.login_contention --logins 16 --requests 300
+    python -m benchmarks.login_contention --inline-hashing   # old behaviour, for comparison
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from app.main import app
+from app.db import connect_to_mongo, close_mongo_connection, get_db
+from app.auth import routes as auth_routes
+from app.auth.utils import hash_password, verify_password
+
+from .stats import report
+
+
+async def measure_dashboard(client: httpx.AsyncClient, headers: dict, requests: int, concurrency: int) -> list[float]:
+    samples: list[float] = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            start = time.perf_counter()
+            r = await client.get("/dashboard/fee-breakdown", headers=headers)
+            samples.append(time.perf_counter() - start)
+            r.raise_for_status()
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return samples
+
+
+async def login_storm(client: httpx.AsyncClient, email: str, password: str, workers: int, stop: asyncio.Event) -> int:
+    count = 0
+
+    async def worker():
+        nonlocal count
+        while not stop.is_set():
+            await client.post("/auth/login", json={"email": email, "password": password})
+            count += 1
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return count
+
+
+async def main(args) -> None:
+    if args.inline_hashing:
+        # Reproduce the pre-pool behaviour: bcrypt directly on the event loop
+        async def inline_verify(plain, hashed):
+            return verify_password(plain, hashed)
+        auth_routes.verify_password_async = inline_verify
+
+    await connect_to_mongo()
+    db = get_db()
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    password = "bench-password"
+    parent = await db.parents.insert_one({"email": email, "full_name": "Bench", "password_hash": hash_password(password), "role": "parent"})
+    student = await db.students.insert_one({"parent_id": str(parent.inserted_id), "name": "Bench Student", "class_id": "1-A", "fee_breakdown": {"tuition": 1000}})
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            token = (await client.post("/auth/login", json={"email": email, "password": password})).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            report("dashboard, idle", await measure_dashboard(client, headers, args.requests, args.concurrency))
+
+            stop = asyncio.Event()
+            storm = asyncio.create_task(login_storm(client, email, password, args.logins, stop))
+            await asyncio.sleep(0.2)
+            busy = await measure_dashboard(client, headers, args.requests, args.concurrency)
+            stop.set()
+            logins = await storm
+            report(f"dashboard, {args.logins} logins", busy)
+            print(f"{'logins completed':<28} {logins}")
+    finally:
+        await db.students.delete_one({"_id": student.inserted_id})
+        await db.parents.delete_one({"_id": parent.inserted_id})
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300, help="dashboard requests per phase")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent dashboard requests")
+    parser.add_argument("--logins", type=int, default=16, help="concurrent login loops during the busy phase")
+    parser.add_argument("--inline-hashing", action="store_true", help="verify passwords on the event loop, as before")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,326 @@
+"""Throughput and latency for every router, offline.
+
+Seeds parents x students x payments into a throwaway database, then drives each
+route in-process (httpx + ASGI transport) at one or more concurrency levels and
+prints throughput and p50/p95/p99 per route. The LLM is the deterministic stub
+backend, so AI routes measure our own overhead plus the configured stub latency.
+
+Mongo is either a real server (--mongo uri, using MONGODB_URI and a separate
+database that is dropped first) or an in-process stand-in (--mongo memory, needs
+the mongomock-motor package). The stand-in cannot evaluate the fee-decrement
+update pipeline, so there /payments/initiate records failed payments only, and its
+timings say nothing about index use; use it for relative comparisons of our code.
+
+    cd backend
+    python -m benchmarks.routes --mongo memory --parents 20 --students 2 --payments 500
+    python -m benchmarks.routes --concurrency 1,8,32 --requests 500 --output before.json
+    python -m benchmarks.routes --routes payment-history,all-receipts --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+import httpx
+
+from app import db as db_module
+from app.main import app
+from app.config import settings
+from app.auth.utils import create_access_token, hash_password, token_claims
+from app.payments.summary import rebuild_summaries
+
+from .stats import summarize
+
+CATEGORIES = ["tuition", "hostel", "transport", "books", "exam"]
+PASSWORD = "bench-password"
+INSERT_BATCH = 5_000
+
+
+@dataclass
+class Account:
+    email: str
+    headers: dict
+    student_ids: list[str]
+    payment_ids: list[str]
+
+
+@dataclass
+class Route:
+    name: str
+    router: str
+    call: Callable[[httpx.AsyncClient, Account, random.Random], Awaitable[httpx.Response]]
+    # Routes that cost a bcrypt hash or a stub LLM call get fewer requests
+    heavy: bool = False
+
+
+def _fee_breakdown(rng: random.Random) -> dict:
+    breakdown = {c: float(rng.randrange(5_000, 80_000, 500)) for c in CATEGORIES}
+    breakdown["scholarships"] = float(rng.randrange(0, 10_000, 500))
+    return breakdown
+
+
+async def seed(db, parents: int, students: int, payments: int, rng: random.Random) -> list[Account]:
+    """Insert the synthetic data set and return one Account per parent."""
+    password_hash = hash_password(PASSWORD)
+    now = datetime.utcnow()
+    parent_docs = [
+        {"email": f"bench-{i}@example.com", "full_name": f"Bench Parent {i}", "password_hash": password_hash, "role": "parent"}
+        for i in range(parents)
+    ]
+    await db.parents.insert_many(parent_docs)
+
+    student_docs = []
+    for parent in parent_docs:
+        for j in range(students):
+            student_docs.append({
+                "parent_id": str(parent["_id"]),
+                "name": f"Student {j} of {parent['full_name']}",
+                "class_id": f"{rng.randint(1, 12)}-{rng.choice('ABC')}",
+                "fee_breakdown": _fee_breakdown(rng),
+            })
+    if student_docs:
+        await db.students.insert_many(student_docs)
+
+    payment_ids: dict[str, list[str]] = {str(p["_id"]): [] for p in parent_docs}
+    batch = []
+    for student in student_docs:
+        for k in range(payments):
+            ok = rng.random() < 0.85
+            batch.append({
+                "parent_id": student["parent_id"],
+                "student_id": str(student["_id"]),
+                "amount": float(rng.randrange(500, 20_000, 250)),
+                "category": rng.choice(CATEGORIES),
+                "status": "success" if ok else "failed",
+                "created_at": now - timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60)),
+                "receipt_id": str(uuid.uuid4()) if ok else None,
+            })
+            if len(batch) >= INSERT_BATCH:
+                await _insert_payments(db, batch, payment_ids)
+                batch = []
+    if batch:
+        await _insert_payments(db, batch, payment_ids)
+
+    await rebuild_summaries(db)
+
+    reminders = [
+        {"parent_id": s["parent_id"], "student_id": str(s["_id"]), "message": "Fee due", "due_date": now + timedelta(days=d)}
+        for s in student_docs for d in (7, 30)
+    ]
+    if reminders:
+        await db.reminders.insert_many(reminders)
+
+    accounts = []
+    for parent in parent_docs:
+        pid = str(parent["_id"])
+        token = create_access_token(token_claims({**parent, "_id": pid}))
+        accounts.append(Account(
+            email=parent["email"],
+            headers={"Authorization": f"Bearer {token}"},
+            student_ids=[str(s["_id"]) for s in student_docs if s["parent_id"] == pid],
+            payment_ids=payment_ids[pid],
+        ))
+    return accounts
+
+
+async def _insert_payments(db, batch: list[dict], payment_ids: dict[str, list[str]]) -> None:
+    await db.payments.insert_many(batch)
+    for doc in batch:
+        if doc["status"] == "success":
+            payment_ids[doc["parent_id"]].append(str(doc["_id"]))
+
+
+def build_routes(payment_outcome: str) -> list[Route]:
+    def get(path: str, **params):
+        return lambda c, a, rng: c.get(path, headers=a.headers, params=params)
+
+    def receipt(c, a, rng):
+        pid = rng.choice(a.payment_ids) if a.payment_ids else "0" * 24
+        return c.get(f"/payments/receipt/{pid}", headers=a.headers)
+
+    def initiate(c, a, rng):
+        body = {"student_id": rng.choice(a.student_ids), "amount": 100.0, "category": rng.choice(CATEGORIES), "simulate": payment_outcome}
+        return c.post("/payments/initiate", headers=a.headers, json=body)
+
+    def create_reminder(c, a, rng):
+        body = {"student_id": rng.choice(a.student_ids), "message": "Bench reminder", "due_date": datetime.utcnow().isoformat()}
+        return c.post("/reminders/", headers=a.headers, json=body)
+
+    def summarize_text(unique: bool):
+        def call(c, a, rng):
+            text = f"Fee notice {uuid.uuid4()}" if unique else "Fee notice: tuition 45000 due 2025-07-01"
+            return c.post("/ai/summarize", headers=a.headers, data={"text": text})
+        return call
+
+    def summarize_receipts(prompt: str):
+        return lambda c, a, rng: c.post("/payments/summarize-receipts", headers=a.headers, json={"prompt": prompt})
+
+    return [
+        Route("login", "auth", lambda c, a, rng: c.post("/auth/login", json={"email": a.email, "password": PASSWORD}), heavy=True),
+        Route("me", "auth", get("/auth/me")),
+        Route("fee-breakdown", "dashboard", get("/dashboard/fee-breakdown")),
+        Route("payment-history", "dashboard", get("/dashboard/payment-history")),
+        Route("payment-history-success", "dashboard", get("/dashboard/payment-history", status="success")),
+        Route("upcoming-dues", "dashboard", get("/dashboard/upcoming-dues")),
+        Route("initiate", "payments", initiate),
+        Route("receipt", "payments", receipt),
+        Route("all-receipts", "payments", get("/payments/all-receipts")),
+        Route("summarize-receipts-local", "payments", summarize_receipts("What is the total paid by category?")),
+        Route("summarize-receipts-ai", "payments", summarize_receipts("Any insight on my spending?"), heavy=True),
+        Route("list-reminders", "reminders", get("/reminders/")),
+        Route("create-reminder", "reminders", create_reminder),
+        Route("summarize-text", "ai", summarize_text(unique=True), heavy=True),
+        Route("summarize-text-cached", "ai", summarize_text(unique=False)),
+        Route("advice", "ai", get("/ai/advice"), heavy=True),
+        Route("export-payments", "exports", get("/exports/payments"), heavy=True),
+        Route("submit-job", "jobs", lambda c, a, rng: c.post("/jobs/", headers=a.headers, json={"kind": "advice"})),
+    ]
+
+
+async def run_route(client: httpx.AsyncClient, route: Route, accounts: list[Account], requests: int, concurrency: int, rng: random.Random) -> dict:
+    samples: list[float] = []
+    statuses: dict[int, int] = {}
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with sem:
+            start = time.perf_counter()
+            try:
+                r = await route.call(client, rng.choice(accounts), rng)
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+                if r.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            samples.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "route": route.name,
+        "router": route.router,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        **summarize(samples),
+    }
+
+
+async def connect(args):
+    if args.mongo == "memory":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("--mongo memory needs the mongomock-motor package")
+        db_module.client = AsyncMongoMockClient()
+        return db_module.get_db()
+    settings.DATABASE_NAME = args.database
+    await db_module.connect_to_mongo()
+    db = db_module.get_db()
+    await db_module.client.drop_database(args.database)
+    await db_module.ensure_indexes()
+    return db
+
+
+def compare(results: list[dict], baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = {(r["route"], r["concurrency"]): r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path}")
+    for r in results:
+        old = baseline.get((r["route"], r["concurrency"]))
+        if not old:
+            continue
+        def delta(key):
+            return f"{(r[key] - old[key]) / old[key] * 100:+6.1f}%" if old[key] else "   n/a"
+        print(f"{r['route']:<26} c={r['concurrency']:<4} rps {delta('throughput_rps')}  p50 {delta('p50_ms')}  p95 {delta('p95_ms')}  p99 {delta('p99_ms')}")
+
+
+async def main(args) -> None:
+    # Configure the stub before anything creates the shared AI service
+    settings.LLM_BACKEND = "stub"
+    settings.LLM_STUB_LATENCY = args.llm_latency
+    settings.LLM_STUB_LATENCY_MS = args.llm_latency_ms
+    settings.LLM_STUB_JITTER_MS = args.llm_jitter_ms
+    settings.LLM_STUB_FAILURE_RATE = args.llm_failure_rate
+
+    rng = random.Random(args.seed)
+    routes = build_routes("failed" if args.mongo == "memory" else "success")
+    if args.routes:
+        wanted = set(args.routes.split(","))
+        routes = [r for r in routes if r.name in wanted or r.router in wanted]
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    db = await connect(args)
+    started = time.perf_counter()
+    accounts = await seed(db, args.parents, args.students, args.payments, rng)
+    print(f"seeded {args.parents} parents x {args.students} students x {args.payments} payments in {time.perf_counter() - started:.1f}s")
+
+    results = []
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for route in routes:
+                requests = max(1, args.requests // 10) if route.heavy and not args.no_throttle else args.requests
+                if args.warmup:
+                    await run_route(client, route, accounts, min(args.warmup, requests), 1, rng)
+                for level in levels:
+                    result = await run_route(client, route, accounts, requests, level, rng)
+                    results.append(result)
+                    print(f"{route.router + '/' + route.name:<36} c={level:<4} n={requests:<5} "
+                          f"{result['throughput_rps']:8.1f} rps  p50={result['p50_ms']:7.1f}ms  "
+                          f"p95={result['p95_ms']:7.1f}ms  p99={result['p99_ms']:7.1f}ms  errors={result['errors']}")
+    finally:
+        if args.mongo != "memory" and not args.keep:
+            await db_module.client.drop_database(args.database)
+        await db_module.close_mongo_connection()
+
+    output = args.output or f"bench-routes-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    meta = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "mongo": args.mongo,
+        "parents": args.parents,
+        "students": args.students,
+        "payments": args.payments,
+        "requests": args.requests,
+        "concurrency": levels,
+        "llm": {"latency": args.llm_latency, "latency_ms": args.llm_latency_ms, "jitter_ms": args.llm_jitter_ms, "failure_rate": args.llm_failure_rate},
+        "seed": args.seed,
+    }
+    with open(output, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"results written to {output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo", choices=["uri", "memory"], default="uri", help="MONGODB_URI server or in-process stand-in")
+    parser.add_argument("--database", default="finance_bench", help="database to seed on the real server (dropped first)")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded database afterwards")
+    parser.add_argument("--parents", type=int, default=20)
+    parser.add_argument("--students", type=int, default=2, help="students per parent")
+    parser.add_argument("--payments", type=int, default=200, help="payments per student")
+    parser.add_argument("--requests", type=int, default=300, help="requests per route and concurrency level")
+    parser.add_argument("--no-throttle", action="store_true", help="send the full request count to bcrypt/LLM routes too")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--routes", help="comma-separated route or router names to run (default: all)")
+    parser.add_argument("--warmup", type=int, default=5, help="sequential requests per route before measuring")
+    parser.add_argument("--llm-latency", default="lognormal", choices=["fixed", "uniform", "normal", "lognormal"])
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=300.0)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0, help="RNG seed for data and request mix")
+    parser.add_argument("--output", help="JSON results path (default: bench-routes-<timestamp>.json)")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    asyncio.run(main(parser.parse_args()))
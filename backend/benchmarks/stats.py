@@ -0,0 +1,24 @@
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def summarize(samples: list[float]) -> dict:
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    ms = [s * 1000 for s in samples]
+    return {
+        "n": len(ms),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "mean_ms": round(sum(ms) / len(ms), 2) if ms else 0.0,
+        "max_ms": round(max(ms), 2) if ms else 0.0,
+    }
+
+
+def report(label: str, samples: list[float]) -> None:
+    s = summarize(samples)
+    print(f"{label:<28} n={s['n']:<5} p50={s['p50_ms']:7.1f}ms  p95={s['p95_ms']:7.1f}ms  p99={s['p99_ms']:7.1f}ms")
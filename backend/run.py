@@ -11,12 +11,67 @@ if __name__ == "__main__":
         reload = os.getenv("RELOAD", "true").lower() == "true"
 
         # Since this script lives in the backend/ directory, target the "app" package directly
-        uvicorn.run("app.main:app", host=host, port=port, reload=reload)
+        # Requests are logged (sampled, with timings) by the app itself
+        uvicorn.run("app.main:app", host=host, port=port, reload=reload, access_log=False)
     elif cmd == "seed":
         # Import seed within the backend package context
         from app.seed.seed_data import run_seed
         import asyncio
         asyncio.run(run_seed())
         print("Seed complete.")
+    elif cmd == "indexes":
+        # Report missing/unused indexes and the plan chosen for each hot query
+        from app.db import connect_to_mongo, close_mongo_connection, index_report
+        import asyncio
+
+        async def _report():
+            await connect_to_mongo()
+            try:
+                return await index_report()
+            finally:
+                await close_mongo_connection()
+
+        report = asyncio.run(_report())
+        for section in ("missing", "unused", "unregistered"):
+            for coll, names in report[section].items():
+                if names:
+                    print(f"{section:>12}  {coll}: {', '.join(names)}")
+        for p in report["plans"]:
+            print(f"{'plan':>12}  {p['collection']} {p['query']} sort={p['sort']}: {p['plan']}")
+    elif cmd == "summaries":
+        # Rebuild every student's account summary from fee_breakdown and payments
+        from app.db import connect_to_mongo, close_mongo_connection, get_db
+        from app.payments.summary import rebuild_summaries
+        import asyncio
+
+        async def _rebuild():
+            await connect_to_mongo()
+            try:
+                return await rebuild_summaries(get_db())
+            finally:
+                await close_mongo_connection()
+
+        print(f"Rebuilt {asyncio.run(_rebuild())} account summaries.")
+    elif cmd == "worker":
+        # Standalone AI job worker, scaled independently of the web tier
+        from app.config import settings
+        from app.db import connect_to_mongo, close_mongo_connection
+        from app.ai.services import init_gemini_service, shutdown_gemini_service
+        from app.jobs.worker import JobWorker
+        from app.logging_config import configure_logging
+        import asyncio
+        configure_logging()
+        concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else max(1, settings.AI_MAX_CONCURRENCY)
+
+        async def _work():
+            await connect_to_mongo()
+            init_gemini_service()
+            try:
+                await JobWorker(concurrency).run_forever()
+            finally:
+                shutdown_gemini_service()
+                await close_mongo_connection()
+
+        asyncio.run(_work())
     else:
-        print("Unknown command. Use: serve | seed")
+        print("Unknown command. Use: serve | seed | indexes | summaries | worker [concurrency]")
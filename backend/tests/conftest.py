@@ -0,0 +1,5 @@
+import os
+
+# Settings requires these; tests never connect to them
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017/finance_test")
+os.environ.setdefault("JWT_SECRET", "test-secret")
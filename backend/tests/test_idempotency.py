@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.config import settings
+from app.payments import idempotency
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+PARENT = "p1"
+RESPONSE = {"payment": {"_id": "abc", "amount": 10.0}}
+
+
+@pytest.fixture
+def db():
+    idempotency._responses.clear()
+    return mongomock_motor.AsyncMongoMockClient().db
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_first_claim_owns_the_key(db):
+    assert run(idempotency.claim(db, PARENT, "k", "fp")) is None
+    record = run(db.idempotency_keys.find_one({"_id": f"{PARENT}:k"}))
+    assert record["status"] == "pending"
+
+
+def test_completed_key_replays_the_stored_response(db):
+    run(idempotency.claim(db, PARENT, "k", "fp"))
+    run(idempotency.complete(db, PARENT, "k", "fp", RESPONSE))
+    assert run(idempotency.claim(db, PARENT, "k", "fp")) == RESPONSE
+    # Another process has no cached copy and replays from Mongo
+    idempotency._responses.clear()
+    assert run(idempotency.claim(db, PARENT, "k", "fp")) == RESPONSE
+
+
+def test_reuse_with_a_different_request_is_a_422(db):
+    run(idempotency.claim(db, PARENT, "k", "fp"))
+    run(idempotency.complete(db, PARENT, "k", "fp", RESPONSE))
+    for cached in (True, False):
+        if not cached:
+            idempotency._responses.clear()
+        with pytest.raises(HTTPException) as exc:
+            run(idempotency.claim(db, PARENT, "k", "other"))
+        assert exc.value.status_code == 422
+
+
+def test_pending_key_is_a_409(db):
+    run(idempotency.claim(db, PARENT, "k", "fp"))
+    with pytest.raises(HTTPException) as exc:
+        run(idempotency.claim(db, PARENT, "k", "fp"))
+    assert exc.value.status_code == 409
+
+
+def test_stale_pending_key_is_reclaimed_once(db):
+    run(idempotency.claim(db, PARENT, "k", "fp"))
+    stale = datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_PENDING_TIMEOUT_SECONDS + 1)
+    run(db.idempotency_keys.update_one({"_id": f"{PARENT}:k"}, {"$set": {"created_at": stale}}))
+    assert run(idempotency.claim(db, PARENT, "k", "fp")) is None
+    with pytest.raises(HTTPException) as exc:
+        run(idempotency.claim(db, PARENT, "k", "fp"))
+    assert exc.value.status_code == 409
+
+
+def test_released_key_can_be_claimed_again(db):
+    run(idempotency.claim(db, PARENT, "k", "fp"))
+    run(idempotency.release(db, PARENT, "k"))
+    assert run(idempotency.claim(db, PARENT, "k", "fp")) is None
+
+
+def test_keys_are_scoped_per_parent(db):
+    run(idempotency.claim(db, PARENT, "k", "fp"))
+    run(idempotency.complete(db, PARENT, "k", "fp", RESPONSE))
+    assert run(idempotency.claim(db, "p2", "k", "fp")) is None
+
+
+def test_overlong_key_is_a_400(db):
+    with pytest.raises(HTTPException) as exc:
+        run(idempotency.claim(db, PARENT, "k" * (idempotency.MAX_KEY_LENGTH + 1), "fp"))
+    assert exc.value.status_code == 400
+
+
+def test_fingerprint_ignores_key_order():
+    assert idempotency.fingerprint({"a": 1, "b": 2}) == idempotency.fingerprint({"b": 2, "a": 1})
+    assert idempotency.fingerprint({"a": 1}) != idempotency.fingerprint({"a": 2})
+
+
+def test_complete_survives_failed_writes_and_still_replays_locally(db, monkeypatch):
+    from pymongo.errors import AutoReconnect
+
+    class Unavailable:
+        calls = 0
+
+        async def update_one(self, *args, **kwargs):
+            Unavailable.calls += 1
+            raise AutoReconnect("down")
+
+    class DownDB:
+        idempotency_keys = Unavailable()
+
+    monkeypatch.setattr(idempotency, "COMPLETE_RETRY_SECONDS", 0)
+    run(idempotency.claim(db, PARENT, "k", "fp"))
+    run(idempotency.complete(DownDB(), PARENT, "k", "fp", RESPONSE))
+    assert Unavailable.calls == idempotency.COMPLETE_ATTEMPTS
+    assert run(idempotency.claim(db, PARENT, "k", "fp")) == RESPONSE
@@ -0,0 +1,72 @@
+import asyncio
+import base64
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.pagination import decode_cursor, encode_cursor, fetch_page, keyset_filter
+
+
+def test_cursor_round_trip():
+    doc = {"created_at": datetime(2024, 3, 5, 10, 30, 15, 123000), "_id": ObjectId()}
+    cursor = encode_cursor(doc)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (doc["created_at"], doc["_id"])
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 at all!",
+    base64.urlsafe_b64encode(b"2024-03-05T10:30:15").decode(),
+    base64.urlsafe_b64encode(b"yesterday|" + str(ObjectId()).encode()).decode(),
+    base64.urlsafe_b64encode(b"2024-03-05T10:30:15|not-an-object-id").decode(),
+    base64.urlsafe_b64encode(b"\xff\xfe|\xff").decode(),
+])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+def test_keyset_filter_without_cursor_returns_query_unchanged():
+    query = {"parent_id": "p1"}
+    assert keyset_filter(query, None) is query
+    assert keyset_filter(query, "") is query
+
+
+def test_keyset_filter_continues_strictly_after_cursor():
+    doc = {"created_at": datetime(2024, 3, 5), "_id": ObjectId()}
+    query = {"parent_id": "p1", "status": "success"}
+    assert keyset_filter(query, encode_cursor(doc)) == {
+        "parent_id": "p1",
+        "status": "success",
+        "$or": [
+            {"created_at": {"$lt": doc["created_at"]}},
+            {"created_at": doc["created_at"], "_id": {"$lt": doc["_id"]}},
+        ],
+    }
+    assert query == {"parent_id": "p1", "status": "success"}
+
+
+def test_fetch_page_walks_every_document_once_across_timestamp_ties():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    async def walk():
+        collection = mongomock_motor.AsyncMongoMockClient().db.payments
+        # Pairs of documents share a created_at, so pages must break ties on _id
+        await collection.insert_many([
+            {"parent_id": "p1", "created_at": datetime(2024, 1, 1 + i // 2)} for i in range(7)
+        ])
+        seen, after = [], None
+        while True:
+            docs, after = await fetch_page(collection, {"parent_id": "p1"}, 3, after)
+            seen.extend(docs)
+            if after is None:
+                return seen
+
+    seen = asyncio.run(walk())
+    assert len(seen) == 7
+    assert len({d["_id"] for d in seen}) == 7
+    keys = [(d["created_at"], d["_id"]) for d in seen]
+    assert keys == sorted(keys, reverse=True)
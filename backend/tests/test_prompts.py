@@ -0,0 +1,47 @@
+from app.ai.prompts import TableBlock, compact_json, estimate_tokens
+
+COLUMNS = ["date", "category", "amount"]
+
+
+def rows(n: int) -> list[dict]:
+    # Newest first, as callers pass them
+    return [{"date": f"2024-01-{28 - i:02d}T09:00:00", "category": "tuition", "amount": 100.0 + i} for i in range(n)]
+
+
+def test_everything_fits_under_a_large_budget():
+    block = TableBlock(rows(3), COLUMNS, budget=1_000)
+    assert (block.included, block.omitted) == (3, 0)
+    assert block.text.splitlines() == [
+        "date,category,amount",
+        "2024-01-28T09:00:00,tuition,100.0",
+        "2024-01-27T09:00:00,tuition,101.0",
+        "2024-01-26T09:00:00,tuition,102.0",
+    ]
+    assert str(block) == block.text
+    assert block.tokens == estimate_tokens(block.text)
+
+
+def test_budget_keeps_newest_rows_and_summarizes_the_rest():
+    data = rows(10)
+    header_and_two_rows = estimate_tokens("date,category,amount\n") + 2 * estimate_tokens("2024-01-28T09:00:00,tuition,100.0\n")
+    block = TableBlock(data, COLUMNS, budget=header_and_two_rows, date_key="date")
+    assert (block.included, block.omitted) == (2, 8)
+    lines = block.text.splitlines()
+    assert lines[1:3] == ["2024-01-28T09:00:00,tuition,100.0", "2024-01-27T09:00:00,tuition,101.0"]
+    omitted_total = sum(r["amount"] for r in data[2:])
+    assert lines[-1] == f"... 8 older records omitted, totalling {omitted_total:.2f}, from 2024-01-19 to 2024-01-26"
+
+
+def test_summary_line_without_dates():
+    block = TableBlock(rows(3), COLUMNS, budget=estimate_tokens("date,category,amount\n"))
+    assert block.included == 0
+    assert block.text.splitlines()[-1] == "... 3 older records omitted, totalling 303.00"
+
+
+def test_missing_values_and_quoting():
+    block = TableBlock([{"date": None, "category": "books, misc", "amount": 5}], COLUMNS, budget=1_000)
+    assert block.text.splitlines()[1] == ',"books, misc",5'
+
+
+def test_compact_json_has_no_whitespace():
+    assert compact_json({"a": [1, 2], "b": None}) == '{"a":[1,2],"b":null}'
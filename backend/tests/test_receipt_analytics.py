@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import pytest
+
+from app.payments.analytics import ReceiptAnalytics
+
+
+@pytest.fixture
+def analytics():
+    this_year = datetime.utcnow().year
+    return ReceiptAnalytics([
+        {"amount": 1000.0, "category": "tuition", "student_name": "Asha", "paid_at": datetime(2024, 3, 5)},
+        {"amount": 500.0, "category": "hostel", "student_name": "Asha", "paid_at": datetime(2024, 4, 10)},
+        {"amount": 250.0, "category": "transport", "student_name": "Ravi", "paid_at": datetime(2023, 11, 20)},
+        {"amount": 100.0, "category": "exam", "student_name": "Ravi", "paid_at": datetime(2023, 12, 1)},
+        {"amount": 2000.0, "category": "tuition", "student_name": "Ravi", "paid_at": datetime(this_year, 1, 15).isoformat()},
+    ])
+
+
+@pytest.mark.parametrize("prompt", [
+    "How much did I pay last month?",
+    "How much did I pay in March?",
+    "Total paid in the last 6 months",
+    "How many payments were not tuition?",
+    "Total excluding hostel",
+    "Total spent on everything other than transport",
+    "How much have I spent since 2023?",
+    "Total paid between 2023 and 2024",
+    "How much did I spend this week?",
+    "Total paid in May 2024",
+    "Total for the past year",
+    "What did I pay for tuition?",
+    "Total paid for tuition and hostel",
+    "How much for Asha and Ravi in total?",
+    "Total paid last year and this year",
+])
+def test_unsupported_prompts_go_to_llm(analytics, prompt):
+    assert analytics.answer(prompt) is None
+
+
+@pytest.mark.parametrize("prompt", [
+    "Why is tuition so expensive? What's the total?",
+    "Should I pay hostel fees early? Total so far?",
+])
+def test_open_ended_prompts_go_to_llm(analytics, prompt):
+    assert analytics.answer(prompt) is None
+
+
+def test_total(analytics):
+    assert analytics.answer("What is the total I have spent?") == "Total of 5 payments: ₹3,850.00"
+
+
+def test_categories_match_whole_words_only(analytics):
+    assert analytics.answer("Total for example purposes") == "Total of 5 payments: ₹3,850.00"
+    assert analytics.answer("Total exam fees") == "Total of 1 exam payments: ₹100.00"
+
+
+def test_total_for_year(analytics):
+    assert analytics.answer("Total tuition paid in 2024") == "Total of 1 tuition payments in 2024: ₹1,000.00"
+
+
+def test_total_this_year(analytics):
+    year = datetime.utcnow().year
+    assert analytics.answer("How much did I spend this year?") == f"Total of 1 payments in {year}: ₹2,000.00"
+
+
+def test_count_for_student(analytics):
+    assert analytics.answer("How many payments for Ravi?") == "You have 3 payments for Ravi."
+
+
+def test_average(analytics):
+    assert analytics.answer("Average payment") == "Average of 5 payments: ₹770.00"
+
+
+def test_monthly(analytics):
+    answer = analytics.answer("Monthly totals for Asha")
+    assert answer == "Monthly totals of payments for Asha:\n- 2024-03: ₹1,000.00\n- 2024-04: ₹500.00"
+
+
+def test_by_category(analytics):
+    answer = analytics.answer("Breakdown by category in 2024")
+    assert answer == "Breakdown of payments in 2024:\n- tuition: ₹1,000.00\n- hostel: ₹500.00"
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from app import metrics
+from app.ai.singleflight import SingleFlight
+
+
+def counts(backend: str) -> tuple:
+    key = (backend,)
+    return metrics.AI_SINGLEFLIGHT_LEADERS._values.get(key, 0), metrics.AI_SINGLEFLIGHT_FOLLOWERS._values.get(key, 0)
+
+
+def test_concurrent_calls_share_one_execution():
+    runs = 0
+
+    async def work():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        return runs
+
+    async def main():
+        flights = SingleFlight("test-share")
+        return await asyncio.gather(*(flights.do("k", work) for _ in range(5)))
+
+    assert asyncio.run(main()) == [1] * 5
+    assert runs == 1
+    assert counts("test-share") == (1, 4)
+
+
+def test_different_keys_and_later_calls_run_separately():
+    runs = 0
+
+    async def work():
+        nonlocal runs
+        runs += 1
+        run = runs
+        await asyncio.sleep(0)
+        return run
+
+    async def main():
+        flights = SingleFlight("test-keys")
+        first = await asyncio.gather(flights.do("a", work), flights.do("b", work))
+        later = await flights.do("a", work)
+        return first, later
+
+    first, later = asyncio.run(main())
+    assert sorted(first) == [1, 2]
+    assert later == 3
+
+
+def test_error_reaches_every_caller():
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("model failed")
+
+    async def main():
+        flights = SingleFlight("test-error")
+        return await asyncio.gather(*(flights.do("k", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) and str(r) == "model failed" for r in results)
+
+
+def test_cancelled_caller_leaves_shared_work_running_for_others():
+    async def main():
+        flights = SingleFlight("test-cancel-one")
+        done = asyncio.Event()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            done.set()
+            return "ok"
+
+        leader = asyncio.create_task(flights.do("k", work))
+        follower = asyncio.create_task(flights.do("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower, done.is_set()
+
+    assert asyncio.run(main()) == ("ok", True)
+
+
+def test_work_is_cancelled_once_every_caller_has_left():
+    async def main():
+        flights = SingleFlight("test-cancel-all")
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.create_task(flights.do("k", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        # The key is free again, so a new call starts fresh work
+        return await flights.do("k", lambda: asyncio.sleep(0, result="fresh"))
+
+    assert asyncio.run(main()) == "fresh"
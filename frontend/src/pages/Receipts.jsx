@@ -4,7 +4,10 @@ import { Receipt, FileText, TrendingUp, Calendar, DollarSign } from 'lucide-reac
 
 export default function Receipts() {
   const [receipts, setReceipts] = useState([])
+  const [totals, setTotals] = useState({ total_count: 0, total_amount: 0, categories: [] })
+  const [nextCursor, setNextCursor] = useState(null)
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [summary, setSummary] = useState('')
   const [prompt, setPrompt] = useState('')
   const [summarizing, setSummarizing] = useState(false)
@@ -13,10 +16,16 @@ export default function Receipts() {
     fetchReceipts()
   }, [])
 
+  const applyPage = (data) => {
+    setTotals({ total_count: data.total_count, total_amount: data.total_amount, categories: data.categories || [] })
+    setNextCursor(data.next_cursor || null)
+  }
+
   const fetchReceipts = async () => {
     try {
       const data = await api.get('/payments/all-receipts')
       setReceipts(data.receipts || [])
+      applyPage(data)
     } catch (error) {
       console.error('Failed to fetch receipts:', error)
     } finally {
@@ -24,6 +33,21 @@ export default function Receipts() {
     }
   }
 
+  // The list is paged; the summary totals always come from the server
+  const loadMoreReceipts = async () => {
+    if (!nextCursor) return
+    setLoadingMore(true)
+    try {
+      const data = await api.get(`/payments/all-receipts?after=${encodeURIComponent(nextCursor)}`)
+      setReceipts((current) => [...current, ...(data.receipts || [])])
+      applyPage(data)
+    } catch (error) {
+      console.error('Failed to fetch more receipts:', error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const handleSummarize = async (e) => {
     e.preventDefault()
     if (!prompt.trim()) return
@@ -126,6 +150,15 @@ export default function Receipts() {
                   </div>
                 </div>
               ))}
+              {nextCursor && (
+                <button
+                  onClick={loadMoreReceipts}
+                  disabled={loadingMore}
+                  className="btn btn-secondary w-full"
+                >
+                  {loadingMore ? 'Loading...' : `Load more (${receipts.length} of ${totals.total_count})`}
+                </button>
+              )}
             </div>
           )}
         </div>
@@ -183,32 +216,32 @@ export default function Receipts() {
       </div>
 
       {/* Summary Statistics */}
-      {receipts.length > 0 && (
+      {totals.total_count > 0 && (
         <div className="card">
           <h2 className="text-xl font-semibold text-gray-900 mb-6">Payment Summary</h2>
           <div className="grid grid-cols-1 md:grid-cols-4 gap-6">
             <div className="text-center p-4 bg-blue-50 rounded-lg">
-              <div className="text-2xl font-bold text-blue-600">{receipts.length}</div>
+              <div className="text-2xl font-bold text-blue-600">{totals.total_count}</div>
               <div className="text-sm text-blue-700">Total Payments</div>
             </div>
 
             <div className="text-center p-4 bg-green-50 rounded-lg">
               <div className="text-2xl font-bold text-green-600">
-                {formatCurrency(receipts.reduce((sum, r) => sum + r.amount, 0))}
+                {formatCurrency(totals.total_amount)}
               </div>
               <div className="text-sm text-green-700">Total Amount</div>
             </div>
 
             <div className="text-center p-4 bg-purple-50 rounded-lg">
               <div className="text-2xl font-bold text-purple-600">
-                {formatCurrency(receipts.reduce((sum, r) => sum + r.amount, 0) / receipts.length)}
+                {formatCurrency(totals.total_amount / totals.total_count)}
               </div>
               <div className="text-sm text-purple-700">Average Payment</div>
             </div>
 
             <div className="text-center p-4 bg-orange-50 rounded-lg">
               <div className="text-2xl font-bold text-orange-600">
-                {new Set(receipts.map(r => r.category)).size}
+                {totals.categories.length}
               </div>
               <div className="text-sm text-orange-700">Categories</div>
             </div>